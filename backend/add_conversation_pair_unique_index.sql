@@ -0,0 +1,60 @@
+-- One conversation per pair of users, whichever of them started it.
+-- UNIQUE(user1_id, user2_id) only covers one ordering, so concurrent
+-- "start conversation" clicks from both sides could create two rows.
+-- get_or_create_conversation relies on this index for its single
+-- INSERT ... ON CONFLICT DO NOTHING statement.
+
+-- Merge duplicates into the oldest conversation of each pair
+CREATE TEMP TABLE conversation_duplicates AS
+SELECT id, keep_id
+FROM (
+    SELECT
+        id,
+        MIN(id) OVER (PARTITION BY LEAST(user1_id, user2_id), GREATEST(user1_id, user2_id)) AS keep_id
+    FROM conversations
+) pairs
+WHERE id <> keep_id;
+
+UPDATE messages m
+SET conversation_id = d.keep_id
+FROM conversation_duplicates d
+WHERE m.conversation_id = d.id;
+
+-- liked_chats and friendships come from optional migrations
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM information_schema.tables
+        WHERE table_schema = 'public' AND table_name = 'liked_chats'
+    ) THEN
+        INSERT INTO liked_chats (user_id, conversation_id, created_at)
+        SELECT lc.user_id, d.keep_id, lc.created_at
+        FROM liked_chats lc
+        JOIN conversation_duplicates d ON d.id = lc.conversation_id
+        ON CONFLICT (user_id, conversation_id) DO NOTHING;
+    END IF;
+END $$;
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM information_schema.tables
+        WHERE table_schema = 'public' AND table_name = 'friendships'
+    ) THEN
+        UPDATE friendships f
+        SET conversation_id = d.keep_id
+        FROM conversation_duplicates d
+        WHERE f.conversation_id = d.id;
+    END IF;
+END $$;
+
+DELETE FROM conversations c
+USING conversation_duplicates d
+WHERE c.id = d.id;
+
+DROP TABLE conversation_duplicates;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_conversations_user_pair
+ON conversations (LEAST(user1_id, user2_id), GREATEST(user1_id, user2_id));
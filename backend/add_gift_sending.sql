@@ -0,0 +1,31 @@
+-- Gift sending (POST /users/<id>/gifts, services/gift_service.py)
+
+-- Append-only audit trail of every points change
+CREATE TABLE IF NOT EXISTS points_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    delta INTEGER NOT NULL,               -- negative for spending
+    balance INTEGER NOT NULL,             -- users.points after the change
+    reason VARCHAR(30) NOT NULL,          -- e.g. 'gift_sent'
+    gift_type VARCHAR(50),
+    counterparty_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_points_ledger_user ON points_ledger(user_id, id);
+
+-- Sharded gift counters: each gift increments one of several rows per
+-- (user, gift type), so gifts to a popular user do not all queue on one
+-- row lock. Readers sum the shards.
+ALTER TABLE user_gifts ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE user_gifts DROP CONSTRAINT IF EXISTS user_gifts_user_id_gift_type_key;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'user_gifts_user_gift_shard_key'
+    ) THEN
+        ALTER TABLE user_gifts
+        ADD CONSTRAINT user_gifts_user_gift_shard_key UNIQUE (user_id, gift_type, shard);
+    END IF;
+END $$;
@@ -0,0 +1,6 @@
+-- Conditional GET on /groups/<id>/messages (services/group_service.py): each
+-- message carries its sender's name and avatar, so the tag needs a stamp that
+-- changes when a member's profile does. profiles_version is bumped for every
+-- group of a user in the transaction that changes their avatar, and the tag
+-- reads it from the group row it already fetches.
+ALTER TABLE groups ADD COLUMN IF NOT EXISTS profiles_version BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,9 @@
+-- Conditional GET (ETags) on /conversations and the message endpoints: the
+-- tags are built from the newest message id per conversation or group, so
+-- MAX(id) for one conversation/group must be a single index probe rather
+-- than a scan of its messages.
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id
+ON messages (conversation_id, id);
+
+CREATE INDEX IF NOT EXISTS idx_group_messages_group_id
+ON group_messages (group_id, id);
@@ -0,0 +1,12 @@
+-- Indexes for typeahead username search (services/user_search_service.py)
+
+-- Prefix search: LOWER(username) LIKE 'abc%' in byte order, so the same index
+-- also serves ORDER BY and the (username, id) keyset cursor
+CREATE INDEX IF NOT EXISTS idx_users_username_prefix
+ON users ((LOWER(username) COLLATE "C"), id);
+
+-- Fuzzy search: trigram similarity (LOWER(username) % 'query')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm
+ON users USING GIN (LOWER(username) gin_trgm_ops);
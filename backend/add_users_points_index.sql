@@ -0,0 +1,5 @@
+-- Leaderboard (services/leaderboard.py): top users by points, highest first,
+-- ties by lowest id. Serves the top-K query used while the in-memory board
+-- is loading (or disabled) and the rank count for a single user.
+CREATE INDEX IF NOT EXISTS idx_users_points
+ON users (points DESC NULLS LAST, id);
@@ -0,0 +1,22 @@
+-- Guarantee a unique index on users.username. register_user inserts with
+-- ON CONFLICT DO NOTHING and relies on it to reject taken usernames.
+-- Databases created from the README schema already have one (UNIQUE), in
+-- which case this does nothing.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = i.indkey[0]
+        WHERE t.relname = 'users'
+        AND i.indisunique
+        AND i.indnatts = 1
+        AND i.indexprs IS NULL
+        AND a.attname = 'username'
+    ) THEN
+        CREATE UNIQUE INDEX idx_users_username_unique ON users (username);
+        RAISE NOTICE 'Created unique index on users.username';
+    END IF;
+END $$;
@@ -1,45 +1,119 @@
-from flask import Flask, request, jsonify, render_template, session, redirect
+from flask import Flask, request, render_template, session, redirect
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import random
 from routes.auth_routes import auth_bp
 from routes.chat_routes import chat_bp
 from routes.user_routes import user_bp
 from routes.group_routes import group_bp
-from services.auth_service import register_user, login_user, get_user_by_id
-from services.chat_service import get_conversations_for_user, get_messages_for_conversation
-from database import init_connection_pool, close_all_connections
+from routes.metrics_routes import metrics_bp
+from routes.health_routes import health_bp
+from routes.bootstrap_routes import bootstrap_bp
+from routes.batch_routes import batch_bp
+from services import leaderboard, username_index
+from utils import cache, compression, metrics, profiler
+import database
+from database import (
+    DB_POOL_MAXCONN,
+    DB_POOL_MINCONN,
+    start_query_stats,
+    stop_query_stats,
+    SQL_SAMPLE_RATE,
+    SQL_QUERY_BUDGET
+)
 
 
 # Get the directory where this file is located
 basedir = os.path.abspath(os.path.dirname(__file__))
-app = Flask(__name__, template_folder=os.path.join(basedir, 'templates'), static_folder=os.path.join(basedir, 'static'))
-app.secret_key = "dev-secret-change-later"
-# Configure session to be more persistent
-app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24 hours
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.register_blueprint(auth_bp)
-app.register_blueprint(chat_bp)
-app.register_blueprint(user_bp)
-app.register_blueprint(group_bp)
-
-# Initialize database connection pool on startup
-try:
-    init_connection_pool()
-    print("[DEBUG app] Database connection pool initialized")
-except Exception as e:
-    print(f"[ERROR app] Failed to initialize database pool: {e}")
-
-# Cleanup on app shutdown
-import atexit
-atexit.register(close_all_connections)
-
-
-@app.route("/")
+
+DEFAULT_CONFIG = {
+    "SECRET_KEY": os.getenv("SECRET_KEY", "dev-secret-change-later"),
+    # Configure session to be more persistent
+    "PERMANENT_SESSION_LIFETIME": 86400,  # 24 hours
+    "SESSION_COOKIE_HTTPONLY": True,
+    "SESSION_COOKIE_SAMESITE": "Lax",
+    "DB_POOL_MINCONN": DB_POOL_MINCONN,
+    "DB_POOL_MAXCONN": DB_POOL_MAXCONN,
+    # In-memory username index and leaderboard, loaded in the background, and
+    # the shared cache versions synced from other workers
+    "BACKGROUND_TASKS": True,
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto are
+    # trusted; 0 uses the socket peer, which is the proxy itself behind one
+    "TRUSTED_PROXY_HOPS": int(os.getenv("TRUSTED_PROXY_HOPS", "0")),
+}
+
+
+def create_app(config=None):
+    """Build the Flask app; config is a dict overriding DEFAULT_CONFIG
+
+    Starts this process's database pool warm-up (closed at exit) without
+    waiting for it, so call it once per process: in gunicorn that is once per
+    worker, from wsgi.py. /readyz reports when the pool is ready.
+    """
+    app = Flask(__name__, template_folder=os.path.join(basedir, 'templates'), static_folder=os.path.join(basedir, 'static'))
+    app.config.from_mapping(DEFAULT_CONFIG)
+    if config:
+        app.config.from_mapping(config)
+
+    # remote_addr is the client, not the proxy, for the per-IP rate limits
+    hops = app.config["TRUSTED_PROXY_HOPS"]
+    if hops > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(chat_bp)
+    app.register_blueprint(user_bp)
+    app.register_blueprint(group_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(bootstrap_bp)
+    app.register_blueprint(batch_bp)
+    # Registered first so its after_request hook runs last, on the final body
+    compression.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    app.before_request(start_sql_instrumentation)
+    app.after_request(report_sql_instrumentation)
+    app.add_url_rule("/", "home", home)
+    app.add_url_rule("/app", "app_page", app_page)
+
+    # Database pool, opened in the background
+    database.init_app(app)
+    if app.config["BACKGROUND_TASKS"]:
+        username_index.start()
+        leaderboard.start()
+        cache.start()
+
+    return app
+
+
+def start_sql_instrumentation():
+    # Only a sample of requests is instrumented so this can stay on in production
+    if random.random() < SQL_SAMPLE_RATE:
+        start_query_stats()
+    else:
+        stop_query_stats()
+
+
+def report_sql_instrumentation(response):
+    stats = stop_query_stats()
+    if stats is None:
+        return response
+
+    response.headers["Server-Timing"] = stats.server_timing()
+    if stats.count > SQL_QUERY_BUDGET:
+        print(f"[WARNING sql] {request.method} {request.path} ran {stats.count} queries "
+              f"(budget {SQL_QUERY_BUDGET}) in {stats.total_time * 1000:.1f}ms")
+    for shape, count in stats.duplicates():
+        print(f"[WARNING sql] {request.method} {request.path} repeated a query {count} times "
+              f"(possible N+1): {shape[:200]}")
+    return response
+
+
 def home():
     return render_template("register.html")
 
 
-@app.route("/app")
 def app_page():
     # Check if user is logged in
     user_id = session.get("user_id")
@@ -61,4 +135,5 @@ def app_page():
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
+    # Development server only; see wsgi.py and gunicorn.conf.py for production
+    create_app().run(debug=os.getenv("FLASK_DEBUG", "1") == "1", port=5001)
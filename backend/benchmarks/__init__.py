@@ -0,0 +1,6 @@
+"""
+Benchmark and load-testing tools.
+
+Run the scripts from the backend directory as modules, e.g.
+python -m benchmarks.generate_data --help
+"""
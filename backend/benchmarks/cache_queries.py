@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Query-count check for the cached read paths.
+
+Drives GET /me, GET /message-color, GET /users/<id> and GET /friends
+(including the If-None-Match revalidation) with Flask's test client against
+a fake database (see fake_db.py) and counts the connection checkouts and statements per request.
+A real checkout also costs the pool's SELECT 1 health check. The check fails
+when a cache hit or a 304 issues any, and when a bump synced from another
+worker does not make the next request reload. No Postgres is needed:
+
+    python -m benchmarks.cache_queries
+"""
+
+import contextlib
+import io
+import os
+import sys
+from datetime import datetime
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_db import ROUTE_MODULES, SERVICE_MODULES, FakeConnection, FakeDatabase, patch_get_connection
+from benchmarks.report import print_table
+
+USER_ID = 1
+OTHER_ID = 2
+
+
+def fake_database(now):
+    db = FakeDatabase()
+    db.on("SELECT now()", [(now,)])
+    db.on("FROM cache_versions", lambda params: [("profile", USER_ID, 1), ("friends", USER_ID, 1)])
+    db.on("information_schema", [(1,)])
+    db.on("u.avatar_key, u.age", lambda params: [
+        (params[0], f"user{params[0]}", f"User {params[0]}", "cat.png", 20, "other", 10, "#6b7280", {})
+    ])
+    db.on("FROM friendships", [(OTHER_ID, "user2", "User 2", "lion.png", 5, 9)])
+    return db
+
+
+def steps():
+    """(label, path, send the last ETag as If-None-Match, expected to be a cache hit)"""
+    return [
+        ("/me miss", "/me", False, False),
+        ("/me hit", "/me", False, True),
+        ("/message-color hit", "/message-color", False, True),
+        ("/users/<id> miss", f"/users/{OTHER_ID}", False, False),
+        ("/users/<id> hit", f"/users/{OTHER_ID}", False, True),
+        ("/friends miss", "/friends", False, False),
+        ("/friends hit", "/friends", False, True),
+        ("/friends 304", "/friends", True, True),
+    ]
+
+
+def run():
+    from app import create_app
+    from utils import cache
+
+    db = fake_database(datetime.now())
+    checkouts = []
+
+    def connect():
+        checkouts.append(1)
+        return FakeConnection(db)
+
+    client = create_app({"BACKGROUND_TASKS": False}).test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = USER_ID
+
+    results = []
+    failures = []
+    etag = None
+
+    def request(label, path, revalidate, cached):
+        nonlocal etag
+        checkouts.clear()
+        db.executed.clear()
+        headers = {"If-None-Match": etag} if revalidate and etag else {}
+        response = client.get(path, headers=headers)
+        etag = response.headers.get("ETag", etag)
+        issued = len(checkouts) + len(db.executed)
+        results.append({
+            "request": label,
+            "status": response.status_code,
+            "checkouts": len(checkouts),
+            "statements": len(db.executed),
+        })
+        if cached and issued:
+            failures.append(f"{label} issued {len(checkouts)} checkout(s) and {len(db.executed)} statement(s)")
+        if not cached and not db.executed:
+            failures.append(f"{label} was served without loading")
+
+    with patch_get_connection(connect, SERVICE_MODULES + ROUTE_MODULES), \
+            contextlib.redirect_stdout(io.StringIO()):
+        for label, path, revalidate, cached in steps():
+            request(label, path, revalidate, cached)
+
+        # Another worker bumped this user's profile and friends
+        cache.sync_shared_versions()
+        request("/me after remote bump", "/me", False, False)
+        request("/friends after remote bump", "/friends", False, False)
+
+    print_table(results, ["request", "status", "checkouts", "statements"])
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("OK: cache hits and revalidations issue no SQL")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
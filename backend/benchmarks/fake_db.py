@@ -0,0 +1,119 @@
+"""
+In-memory stand-in for a psycopg2 connection, for running service functions
+without a database.
+
+A FakeDatabase holds rules mapping SQL fragments to canned rows. Services get
+a FakeConnection from use_fake_db(), which swaps get_connection in the service
+modules for the duration of a with-block:
+
+    db = FakeDatabase()
+    db.on("FROM messages m", rows)
+    with use_fake_db(db):
+        get_messages_for_conversation(1)
+"""
+
+import contextlib
+import importlib
+
+# Service modules that import get_connection by name
+SERVICE_MODULES = [
+    "services.auth_service",
+    "services.chat_service",
+    "services.friend_service",
+    "services.gift_service",
+    "services.group_service",
+    "services.leaderboard",
+    "services.user_search_service",
+    "utils.cache",
+]
+
+# Route modules import it too; some also re-import it from database at call time
+ROUTE_MODULES = [
+    "database",
+    "routes.chat_routes",
+    "routes.user_routes",
+]
+
+
+class FakeDatabase:
+    """Ordered (fragment, rows) rules; the first rule whose fragment is in the SQL wins"""
+
+    def __init__(self):
+        self.rules = []
+        self.executed = []
+
+    def on(self, fragment, rows):
+        """rows is a list of tuples, or a callable taking the query params"""
+        self.rules.append((fragment, rows))
+        return self
+
+    def rows_for(self, sql, params):
+        self.executed.append(sql)
+        for fragment, rows in self.rules:
+            if fragment in sql:
+                return list(rows(params) if callable(rows) else rows)
+        return []
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        self.rows = self.db.rows_for(sql, params)
+        self.rowcount = len(self.rows)
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@contextlib.contextmanager
+def patch_get_connection(factory, modules=SERVICE_MODULES):
+    """Replace get_connection with factory in every listed module"""
+    patched = []
+    for name in modules:
+        module = importlib.import_module(name)
+        patched.append((module, module.get_connection))
+        module.get_connection = factory
+    try:
+        yield
+    finally:
+        for module, original in patched:
+            module.get_connection = original
+
+
+@contextlib.contextmanager
+def use_fake_db(db):
+    """Point every service module's get_connection at db"""
+    with patch_get_connection(lambda: FakeConnection(db)):
+        yield db
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Generate a production-shaped dataset and bulk load it into a local Postgres.
+
+Rows are streamed into the database with COPY rather than row-by-row INSERTs,
+so a 100k user / multi-million message dataset loads in minutes. Activity is
+skewed with a Zipf distribution: a few users, conversations and groups ("hot
+rooms") receive most of the traffic, like in production. The same --seed
+always produces the same dataset.
+
+Point database.py at the target with the DB_* environment variables:
+
+    DB_HOST=localhost DB_USER=postgres DB_PASSWORD=postgres DB_SSLMODE=disable \\
+        python -m benchmarks.generate_data --reset
+
+Every generated user can log in with the --password value (default "loadtest").
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bcrypt
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from database import DB_CONFIG, get_connection, return_connection
+from create_public_groups import GROUP_NAMES
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "schema.sql")
+
+# Migration scripts applied after the base tables are loaded, in order
+MIGRATIONS = [
+    "add_message_color_column.sql",
+    "add_message_color_to_messages.sql",
+    "add_audio_support.sql",
+    "create_gifts_table.sql",
+    "create_liked_chats_table.sql",
+    "create_liked_groups_table.sql",
+    "create_friendships_table.sql",
+    "add_conversation_pair_unique_index.sql",
+    "add_username_search_indexes.sql",
+    "add_users_username_unique.sql",
+    "add_gift_sending.sql",
+    "add_users_points_index.sql",
+    "add_message_tag_indexes.sql",
+    "create_cache_versions_table.sql",
+    "add_groups_profiles_version.sql",
+]
+
+# Tables created by the generator, in dependency order
+TABLES = ["users", "conversations", "messages", "groups", "group_members", "group_messages"]
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1", "")
+
+AVATARS = [
+    "brownbear.png", "cat.png", "cow.png", "gorilla.png",
+    "lion.png", "panda.png", "panther.png", "smalldog.png"
+]
+GENDERS = ["male", "female", "other"]
+ADJECTIVES = [
+    "silent", "midnight", "lucky", "cosmic", "velvet", "neon", "lazy", "brave",
+    "shy", "wild", "golden", "frosty", "sunny", "mystic", "quiet", "rapid"
+]
+NOUNS = [
+    "fox", "owl", "tiger", "panda", "wolf", "raven", "otter", "lynx",
+    "falcon", "koala", "bear", "shark", "moth", "comet", "river", "echo"
+]
+WORDS = [
+    "hey", "hi", "lol", "yes", "no", "maybe", "tonight", "later", "coffee",
+    "movie", "game", "what", "are", "you", "doing", "see", "the", "new",
+    "song", "haha", "sure", "why", "not", "let's", "go", "miss", "this",
+    "crazy", "day", "sleep", "weekend", "party", "work", "sounds", "good"
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000, help="number of users")
+    parser.add_argument("--conversations-per-user", type=float, default=8.0,
+                        help="average number of DM conversations each user takes part in")
+    parser.add_argument("--messages", type=int, default=2_000_000, help="number of DM messages")
+    parser.add_argument("--groups", type=int, default=200,
+                        help="number of groups (the named public groups come first)")
+    parser.add_argument("--max-group-members", type=int, default=5_000,
+                        help="members of the hottest group; smaller groups follow the skew")
+    parser.add_argument("--group-messages", type=int, default=1_000_000, help="number of group messages")
+    parser.add_argument("--skew", type=float, default=1.1,
+                        help="Zipf exponent for user, conversation and group activity (0 = uniform)")
+    parser.add_argument("--days", type=int, default=90, help="spread message timestamps over this many days")
+    parser.add_argument("--seed", type=int, default=42, help="random seed; same seed, same dataset")
+    parser.add_argument("--password", default="loadtest", help="password shared by every generated user")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="rows per COPY batch")
+    parser.add_argument("--reset", action="store_true",
+                        help="drop the existing tables in the target database first")
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="allow a non-local DB_HOST (never point this at production)")
+    return parser.parse_args(argv)
+
+
+def zipf_weights(n, skew):
+    """Cumulative Zipf weights for ranks 1..n, for use with random.choices"""
+    cumulative = []
+    total = 0.0
+    for rank in range(1, n + 1):
+        total += 1.0 / (rank ** skew)
+        cumulative.append(total)
+    return cumulative
+
+
+def copy_value(value):
+    """Format a value for COPY ... FROM STDIN text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    text = str(value)
+    if "\\" in text or "\t" in text or "\n" in text or "\r" in text:
+        text = (text.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+    return text
+
+
+def copy_rows(cur, table, columns, rows, batch_size):
+    """Stream rows into table with COPY, batch_size rows per round-trip"""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    buffer = io.StringIO()
+    pending = 0
+    total = 0
+    for row in rows:
+        buffer.write("\t".join(copy_value(v) for v in row))
+        buffer.write("\n")
+        pending += 1
+        if pending >= batch_size:
+            buffer.seek(0)
+            cur.copy_expert(sql, buffer)
+            total += pending
+            buffer = io.StringIO()
+            pending = 0
+    if pending:
+        buffer.seek(0)
+        cur.copy_expert(sql, buffer)
+        total += pending
+    return total
+
+
+def random_text(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+
+
+class DatasetGenerator:
+    """Deterministic row generators for every table, driven by one seeded RNG"""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.end = datetime(2025, 1, 1)
+        self.start = self.end - timedelta(days=args.days)
+        # Users ranked by activity: rank 0 is the most active user
+        self.activity_order = list(range(1, args.users + 1))
+        self.rng.shuffle(self.activity_order)
+        self.user_weights = zipf_weights(args.users, args.skew)
+        self.conversations = []
+        self.group_members = {}
+
+    def random_time(self):
+        span = (self.end - self.start).total_seconds()
+        return self.start + timedelta(seconds=self.rng.random() * span)
+
+    def sorted_times(self, count):
+        """count timestamps in ascending order, so ids follow time like in production"""
+        span = (self.end - self.start).total_seconds()
+        offsets = sorted(self.rng.random() * span for _ in range(count))
+        return (self.start + timedelta(seconds=offset) for offset in offsets)
+
+    def users(self, password_hash):
+        rng = self.rng
+        for user_id in range(1, self.args.users + 1):
+            adjective = rng.choice(ADJECTIVES)
+            noun = rng.choice(NOUNS)
+            username = f"{adjective}_{noun}{user_id}"
+            # Most users never earn points; a long tail earns a lot
+            points = int(rng.paretovariate(1.5) * 10) - 10 if rng.random() < 0.3 else 0
+            yield (
+                user_id,
+                username,
+                f"{adjective.title()} {noun.title()}",
+                password_hash,
+                rng.choice(AVATARS),
+                rng.randint(18, 60),
+                rng.choice(GENDERS),
+                max(points, 0),
+                self.random_time()
+            )
+
+    def conversation_rows(self):
+        args = self.args
+        rng = self.rng
+        target = int(args.users * args.conversations_per_user / 2)
+        initiators = rng.choices(self.activity_order, cum_weights=self.user_weights, k=target)
+        seen = set()
+        conversation_id = 0
+        for user_a in initiators:
+            user_b = rng.randint(1, args.users)
+            pair = (min(user_a, user_b), max(user_a, user_b))
+            if user_a == user_b or pair in seen:
+                continue
+            seen.add(pair)
+            conversation_id += 1
+            self.conversations.append((user_a, user_b))
+            yield (conversation_id, user_a, user_b, self.random_time())
+
+    def message_rows(self):
+        rng = self.rng
+        count = len(self.conversations)
+        if not count:
+            return
+        # Hot conversations: rank conversations independently of their users
+        order = list(range(count))
+        rng.shuffle(order)
+        picks = rng.choices(order, cum_weights=zipf_weights(count, self.args.skew), k=self.args.messages)
+        for message_id, (index, sent_at) in enumerate(zip(picks, self.sorted_times(len(picks))), start=1):
+            user_a, user_b = self.conversations[index]
+            sender = user_a if rng.random() < 0.5 else user_b
+            yield (message_id, index + 1, sender, random_text(rng), sent_at)
+
+    def group_rows(self):
+        rng = self.rng
+        for group_id in range(1, self.args.groups + 1):
+            if group_id <= len(GROUP_NAMES):
+                name = GROUP_NAMES[group_id - 1]
+            else:
+                name = f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOUNS).title()}s {group_id}"
+            yield (group_id, name, rng.choice(self.activity_order[:1000]), True, self.random_time())
+
+    def group_member_rows(self):
+        args = self.args
+        rng = self.rng
+        member_id = 0
+        for group_id in range(1, args.groups + 1):
+            # Group sizes follow the skew: group 1 is the hottest room
+            size = max(2, int(args.max_group_members / (group_id ** args.skew)))
+            size = min(size, args.users)
+            members = rng.sample(range(1, args.users + 1), size)
+            self.group_members[group_id] = members
+            for user_id in members:
+                member_id += 1
+                yield (member_id, group_id, user_id, self.random_time())
+
+    def group_message_rows(self):
+        rng = self.rng
+        group_ids = list(self.group_members)
+        if not group_ids:
+            return
+        picks = rng.choices(group_ids, cum_weights=zipf_weights(len(group_ids), self.args.skew),
+                            k=self.args.group_messages)
+        for message_id, (group_id, sent_at) in enumerate(zip(picks, self.sorted_times(len(picks))), start=1):
+            sender = rng.choice(self.group_members[group_id])
+            yield (message_id, group_id, sender, random_text(rng), sent_at)
+
+
+def split_schema(path):
+    """Split schema.sql into table statements and index statements"""
+    with open(path) as f:
+        statements = [s.strip() for s in f.read().split(";")]
+    statements = ["\n".join(l for l in s.splitlines() if not l.startswith("--")).strip() for s in statements]
+    statements = [s for s in statements if s]
+    tables = [s for s in statements if not s.upper().startswith("CREATE INDEX")]
+    indexes = [s for s in statements if s.upper().startswith("CREATE INDEX")]
+    return tables, indexes
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    suffix = f" ({result:,} rows, {result / elapsed:,.0f} rows/s)" if isinstance(result, int) else ""
+    print(f"  {label}: {elapsed:.1f}s{suffix}")
+    return result
+
+
+def generate(args):
+    host = str(DB_CONFIG.get("host") or "")
+    if host not in LOCAL_HOSTS and not host.startswith("/") and not args.allow_remote:
+        print(f"ERROR: DB_HOST is {host!r}. The generator only writes to a local database;")
+        print("       set DB_HOST=localhost (or pass --allow-remote for a disposable server).")
+        return 1
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'public' AND table_name = ANY(%s)",
+            (TABLES,)
+        )
+        if cur.fetchone()[0] and not args.reset:
+            print("ERROR: tables already exist in the target database; pass --reset to drop them")
+            return 1
+
+        generator = DatasetGenerator(args)
+        print(f"Generating dataset (seed={args.seed}, users={args.users:,}, skew={args.skew})")
+
+        if args.reset:
+            cur.execute("DROP SCHEMA public CASCADE")
+            cur.execute("CREATE SCHEMA public")
+            conn.commit()
+
+        table_statements, index_statements = split_schema(SCHEMA_FILE)
+        for statement in table_statements:
+            cur.execute(statement)
+
+        # One shared hash: hashing 100k passwords individually would take hours
+        password_hash = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+        batch = args.batch_size
+        timed("users", copy_rows, cur, "users",
+              ["id", "username", "display_name", "password", "avatar_key", "age", "gender", "points", "created_at"],
+              generator.users(password_hash), batch)
+        timed("conversations", copy_rows, cur, "conversations",
+              ["id", "user1_id", "user2_id", "created_at"], generator.conversation_rows(), batch)
+        timed("messages", copy_rows, cur, "messages",
+              ["id", "conversation_id", "sender_id", "content", "timestamp"], generator.message_rows(), batch)
+        timed("groups", copy_rows, cur, "groups",
+              ["id", "name", "created_by", "is_public", "created_at"], generator.group_rows(), batch)
+        timed("group_members", copy_rows, cur, "group_members",
+              ["id", "group_id", "user_id", "joined_at"], generator.group_member_rows(), batch)
+        timed("group_messages", copy_rows, cur, "group_messages",
+              ["id", "group_id", "sender_id", "content", "timestamp"], generator.group_message_rows(), batch)
+
+        # Explicit ids were loaded, so move the sequences past them
+        for table in TABLES:
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+            )
+        conn.commit()
+
+        # Building indexes after the load is much faster than maintaining them during COPY
+        started = time.perf_counter()
+        for statement in index_statements:
+            cur.execute(statement)
+        conn.commit()
+        print(f"  indexes: {time.perf_counter() - started:.1f}s")
+
+        for migration in MIGRATIONS:
+            with open(os.path.join(BACKEND_DIR, migration)) as f:
+                cur.execute(f.read())
+            conn.commit()
+            print(f"  applied {migration}")
+
+        conn.autocommit = True
+        cur.execute("VACUUM ANALYZE")
+        print(f"Done. Every generated user's password is {args.password!r}")
+        return 0
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = False
+        cur.close()
+        return_connection(conn)
+
+
+if __name__ == "__main__":
+    sys.exit(generate(parse_args()))
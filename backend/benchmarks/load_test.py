@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test that drives the real Flask app over HTTP.
+
+Each virtual user logs in as one of the generated users (see generate_data.py)
+and then loops over scripted scenarios picked from a weighted mix:
+
+    inbox    GET /me, GET /conversations, GET /friends
+    chat     open a conversation from the inbox, read it, send a message
+    groups   GET /groups, read a group, post to it if a member
+    search   GET /search-users with a username prefix, start a conversation
+    register POST /register a fresh account, then GET /me
+
+By default the app is started in-process on a free port (convenient, but the
+server shares the GIL with the clients); pass --base-url to load an app
+started separately, e.g. under gunicorn, for accurate numbers (start it with
+RATE_LIMIT_ENABLED=0, since every virtual user logs in from the same IP).
+
+    python -m benchmarks.load_test --users 50 --duration 60
+    python -m benchmarks.load_test --compare benchmarks/results/load-abc1234.json
+
+Results (throughput and p50/p95/p99 per endpoint) are printed and saved to
+benchmarks/results/load-<git revision>.json for comparison across commits.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.report import load_results, print_comparison, print_table, save_results, summarize
+
+DEFAULT_MIX = "inbox=3,chat=4,groups=2,search=1"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load test for the Flask app")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which users start")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="mean pause between scenarios per user, in seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"weighted scenario mix (default {DEFAULT_MIX}; add register=N to include signups)")
+    parser.add_argument("--password", default="loadtest", help="password of the generated users")
+    parser.add_argument("--base-url", help="target an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for scenario choices")
+    parser.add_argument("--output", help="where to save the JSON results")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    return parser.parse_args(argv)
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class Recorder:
+    """Thread-safe latency and status recorder keyed by endpoint name"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, elapsed, ok):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+class Client:
+    """One virtual user: a cookie-carrying HTTP client that records every call"""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def call(self, method, path, endpoint, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        started = time.perf_counter()
+        status = 0
+        payload = None
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                status = response.status
+                raw = response.read()
+        except urllib.error.HTTPError as e:
+            status = e.code
+            raw = e.read()
+        except Exception:
+            raw = b""
+        elapsed = time.perf_counter() - started
+        self.recorder.record(f"{method} {endpoint}", elapsed, 200 <= status < 400)
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            payload = None
+        return status, payload
+
+
+def scenario_inbox(client, rng, ctx):
+    client.call("GET", "/me", "/me")
+    client.call("GET", "/conversations", "/conversations")
+    client.call("GET", "/friends", "/friends")
+
+
+def scenario_chat(client, rng, ctx):
+    _, inbox = client.call("GET", "/conversations", "/conversations")
+    direct = [c for c in (inbox or []) if not c.get("is_group") and c.get("conversation_id")]
+    if not direct:
+        return
+    # Users reopen recent conversations far more often than old ones
+    conversation = direct[min(int(rng.expovariate(0.5)), len(direct) - 1)]
+    conversation_id = conversation["conversation_id"]
+    client.call("GET", f"/conversations/{conversation_id}/messages", "/conversations/<id>/messages")
+    client.call("POST", "/messages", "/messages",
+                {"conversation_id": conversation_id, "content": f"load test {rng.randint(0, 10**6)}"})
+
+
+def scenario_groups(client, rng, ctx):
+    _, groups = client.call("GET", "/groups", "/groups")
+    if not groups:
+        return
+    group = groups[min(int(rng.expovariate(0.3)), len(groups) - 1)]
+    group_id = group["group_id"]
+    client.call("GET", f"/groups/{group_id}/messages", "/groups/<id>/messages")
+    if group.get("is_member"):
+        client.call("POST", f"/groups/{group_id}/messages", "/groups/<id>/messages",
+                    {"content": f"load test {rng.randint(0, 10**6)}"})
+
+
+def scenario_search(client, rng, ctx):
+    username = rng.choice(ctx["usernames"])
+    # Type the name a few characters at a time, like the debounced search box
+    for length in (3, 6, len(username)):
+        query = urllib.parse.quote(username[:length])
+        status, results = client.call("GET", f"/search-users?q={query}", "/search-users")
+    if results:
+        client.call("POST", "/start-conversation", "/start-conversation", {"user_id": results[0]["user_id"]})
+
+
+def scenario_register(client, rng, ctx):
+    # Register on a fresh client so this virtual user's session stays logged in
+    new_client = Client(client.base_url, client.recorder)
+    name = f"lt_{os.getpid()}_{threading.get_ident() % 100000}_{rng.randint(0, 10**9)}"
+    new_client.call("POST", "/register", "/register", {
+        "username": name[:50], "display_name": "Load Test", "age": 25,
+        "gender": "other", "password": ctx["password"], "avatar": "cat.png"
+    })
+    new_client.call("GET", "/me", "/me")
+
+
+SCENARIOS = {
+    "inbox": scenario_inbox,
+    "chat": scenario_chat,
+    "groups": scenario_groups,
+    "search": scenario_search,
+    "register": scenario_register,
+}
+
+
+def virtual_user(index, args, ctx, recorder, stop_at, start_delay):
+    rng = random.Random(args.seed * 100003 + index)
+    time.sleep(start_delay)
+    client = Client(ctx["base_url"], recorder)
+    username = ctx["usernames"][index % len(ctx["usernames"])]
+    status, _ = client.call("POST", "/login", "/login", {"username": username, "password": args.password})
+    if status != 200:
+        print(f"[WARNING load_test] Login failed for {username} (status {status})")
+        return
+    names = list(ctx["mix"])
+    weights = [ctx["mix"][n] for n in names]
+    while time.monotonic() < stop_at:
+        scenario = rng.choices(names, weights=weights)[0]
+        SCENARIOS[scenario](client, rng, ctx)
+        if args.think_time:
+            time.sleep(rng.expovariate(1.0 / args.think_time))
+
+
+def load_usernames(count):
+    """The most active generated users, so scenarios hit realistic data"""
+    from database import get_connection, return_connection
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT u.username
+            FROM users u
+            JOIN conversations c ON c.user1_id = u.id
+            GROUP BY u.id, u.username
+            ORDER BY COUNT(*) DESC
+            LIMIT %s
+        """, (count,))
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        cur.close()
+        return_connection(conn)
+
+
+def start_server():
+    """Serve the app on a free local port in a background thread"""
+    from werkzeug.serving import make_server
+    from app import create_app
+    from utils import rate_limit
+    # Every virtual user logs in from 127.0.0.1
+    rate_limit.RATE_LIMIT_ENABLED = False
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def run(args):
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server, base_url = start_server()
+    base_url = base_url.rstrip("/")
+
+    usernames = load_usernames(max(args.users, 100))
+    if not usernames:
+        print("ERROR: no users with conversations found; run benchmarks.generate_data first")
+        return 1
+
+    ctx = {"base_url": base_url, "usernames": usernames, "mix": parse_mix(args.mix), "password": args.password}
+    recorder = Recorder()
+    stop_at = time.monotonic() + args.ramp_up + args.duration
+    print(f"Running {args.users} virtual users against {base_url} for {args.duration:.0f}s "
+          f"(+{args.ramp_up:.0f}s ramp-up), mix {args.mix}")
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(
+            target=virtual_user,
+            args=(i, args, ctx, recorder, stop_at, args.ramp_up * i / max(args.users, 1)),
+            daemon=True
+        )
+        for i in range(args.users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+    if server:
+        server.shutdown()
+
+    endpoints = {}
+    for endpoint, samples in recorder.latencies.items():
+        stats = summarize(samples)
+        stats["errors"] = recorder.errors.get(endpoint, 0)
+        stats["rps"] = round(len(samples) / wall_time, 2)
+        endpoints[endpoint] = stats
+    total = sum(s["count"] for s in endpoints.values())
+
+    rows = [{"endpoint": name, **stats} for name, stats in sorted(endpoints.items())]
+    print_table(rows, ["endpoint", "count", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    print(f"\nTotal: {total} requests in {wall_time:.1f}s ({total / wall_time:.1f} req/s)")
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(total / wall_time, 2),
+        "endpoints": endpoints,
+    }
+    # Read the baseline before saving, in case both runs share a revision
+    baseline = load_results(args.compare) if args.compare else None
+    path = save_results("load", results, args.output)
+    print(f"Saved results to {path}")
+
+    if baseline:
+        print(f"\np95 compared with {args.compare} (revision {baseline.get('revision')}):")
+        print_comparison(baseline["endpoints"], endpoints, "p95_ms")
+        print(f"\nThroughput: {baseline.get('throughput_rps')} -> {results['throughput_rps']} req/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
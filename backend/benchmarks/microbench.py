@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pure-Python parts of the hot service functions.
+
+The database is replaced with canned rows (see fake_db.py), so the numbers
+measure only row-to-dict serialization, sorting and any per-row logging the
+services do. No Postgres is needed:
+
+    python -m benchmarks.microbench
+    python -m benchmarks.microbench --rows 5000 --only messages
+    python -m benchmarks.microbench --compare benchmarks/results/micro-abc1234.json --max-regression 20
+
+With --max-regression the script exits non-zero when any benchmark's time per
+row got worse than the baseline by more than that percentage.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_db import FakeDatabase, use_fake_db
+from benchmarks.report import load_results, print_comparison, print_table, save_results
+
+AVATARS = ["cat.png", "lion.png", "panda.png", "cow.png"]
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def message_rows(count):
+    return [
+        (i, 1 + i % 2, f"message number {i}", BASE_TIME + timedelta(seconds=i), AVATARS[i % 4], "#6b7280")
+        for i in range(1, count + 1)
+    ]
+
+
+def group_message_rows(count):
+    return [
+        (i, 7, 1 + i % 50, f"group message {i}", BASE_TIME + timedelta(seconds=i),
+         f"user{i % 50}", None if i % 3 else f"User {i % 50}", AVATARS[i % 4], "#6b7280")
+        for i in range(1, count + 1)
+    ]
+
+
+def inbox_rows(count):
+    # Conversations with and without messages, in no particular order
+    return [
+        (i, 1000 + i, f"user{i}", f"User {i}", AVATARS[i % 4],
+         BASE_TIME - timedelta(minutes=(i * 37) % 5000) if i % 5 else None,
+         f"last message {i}" if i % 5 else None, i % 7 == 0)
+        for i in range(1, count + 1)
+    ]
+
+
+def joined_group_rows(count):
+    return [
+        (i, f"Group {i}", 1, BASE_TIME, f"hello {i}", BASE_TIME - timedelta(minutes=i * 13), i % 4 == 0)
+        for i in range(1, count + 1)
+    ]
+
+
+def friend_rows(count):
+    return [(1000 + i, f"user{i}", None if i % 4 == 0 else f"User {i}", AVATARS[i % 4], i * 3, i)
+            for i in range(1, count + 1)]
+
+
+def bench_messages(rows):
+    from services.chat_service import get_messages_for_conversation
+    db = FakeDatabase()
+    db.on("information_schema.columns", [("message_color",)])
+    db.on("FROM messages m", message_rows(rows))
+    return db, lambda: get_messages_for_conversation(1)
+
+
+def bench_group_messages(rows):
+    from services.group_service import get_group_messages
+    db = FakeDatabase()
+    db.on("SELECT id FROM groups", [(7,)])
+    db.on("information_schema.columns", [("message_color",)])
+    db.on("FROM group_messages gm", group_message_rows(rows))
+    return db, lambda: get_group_messages(7, 1)
+
+
+def bench_inbox(rows):
+    from services.chat_service import get_conversations_for_user
+    conversations = inbox_rows(rows)
+    db = FakeDatabase()
+    db.on("SELECT id FROM users WHERE id", [(1,)])
+    db.on("SELECT COUNT(*) FROM conversations", [(rows,)])
+    db.on("SELECT id, user1_id, user2_id", [(r[0], 1, r[1]) for r in conversations])
+    db.on("SELECT id, username FROM users", lambda params: [(params[0], f"user{params[0]}")])
+    db.on("information_schema.tables", [(True,)])
+    db.on("INNER JOIN group_members", joined_group_rows(max(rows // 10, 1)))
+    db.on("AS conversation_id", conversations)
+    return db, lambda: get_conversations_for_user(1)
+
+
+def bench_friends(rows):
+    from services.friend_service import get_friends_for_user
+    friends = friend_rows(rows)
+    db = FakeDatabase()
+    db.on("information_schema.tables", [(True,)])
+    db.on("FROM friendships", friends)
+    return db, lambda: get_friends_for_user(1)
+
+
+BENCHMARKS = {
+    "messages": bench_messages,
+    "group_messages": bench_group_messages,
+    "inbox": bench_inbox,
+    "friends": bench_friends,
+}
+
+
+def measure(func, repeat, number):
+    """Best-of-repeat seconds per call; the services' print output is discarded"""
+    best = float("inf")
+    sink = io.StringIO()
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(sink):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = (time.perf_counter() - started) / number
+        sink.seek(0)
+        sink.truncate()
+        best = min(best, elapsed)
+    return best
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Service-level microbenchmarks with a fake database")
+    parser.add_argument("--rows", type=int, default=1000, help="rows returned by the main query")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats (best is reported)")
+    parser.add_argument("--number", type=int, default=20, help="calls per repeat")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--output", help="where to save the JSON results")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="with --compare, fail if any us/row got worse by more than this percentage")
+    return parser.parse_args(argv)
+
+
+def run(args):
+    results = {}
+    for name in args.only or sorted(BENCHMARKS):
+        db, func = BENCHMARKS[name](args.rows)
+        with use_fake_db(db):
+            # One warm-up call, which also counts the statements issued
+            db.executed.clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                func()
+            queries = len(db.executed)
+            seconds = measure(func, args.repeat, args.number)
+        results[name] = {
+            "rows": args.rows,
+            "queries": queries,
+            "ms_per_call": round(seconds * 1000.0, 4),
+            "us_per_row": round(seconds * 1e6 / args.rows, 4),
+        }
+
+    print_table([{"benchmark": k, **v} for k, v in results.items()],
+                ["benchmark", "rows", "queries", "ms_per_call", "us_per_row"])
+
+    baseline = load_results(args.compare) if args.compare else None
+    path = save_results("micro", {"config": {"rows": args.rows}, "benchmarks": results}, args.output)
+    print(f"Saved results to {path}")
+
+    if baseline:
+        print(f"\nus/row compared with {args.compare} (revision {baseline.get('revision')}):")
+        print_comparison(baseline["benchmarks"], results, "us_per_row")
+        if args.max_regression is not None:
+            regressed = [
+                name for name, stats in results.items()
+                if name in baseline["benchmarks"] and baseline["benchmarks"][name]["us_per_row"]
+                and (stats["us_per_row"] / baseline["benchmarks"][name]["us_per_row"] - 1) * 100 > args.max_regression
+            ]
+            if regressed:
+                print(f"\nFAIL: regressed by more than {args.max_regression}%: {', '.join(regressed)}")
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
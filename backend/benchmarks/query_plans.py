@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression check for the hot SQL statements.
+
+Drives the real endpoints (inbox, messages, group directory and messages,
+friends, search, profile, membership-checked writes) with Flask's test client
+against a seeded local Postgres (see generate_data.py). Every SELECT the
+routes and services issue is first run through EXPLAIN (FORMAT JSON); the
+check fails when a plan contains a sequential scan on a guarded table whose
+estimated size is above --min-rows.
+
+All statements run in one transaction that is rolled back at the end, so the
+write endpoints leave the database unchanged.
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --min-rows 50000 --table users --verbose
+"""
+
+import argparse
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_db import ROUTE_MODULES, SERVICE_MODULES, patch_get_connection
+
+GUARDED_TABLES = ["messages", "group_messages", "conversations"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when hot queries fall back to sequential scans")
+    parser.add_argument("--min-rows", type=int, default=10_000,
+                        help="only flag sequential scans on tables estimated above this many rows")
+    parser.add_argument("--table", action="append", default=[],
+                        help="guard an additional table (repeatable)")
+    parser.add_argument("--verbose", action="store_true", help="print every explained statement")
+    return parser.parse_args(argv)
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+
+def first_line(sql):
+    lines = [l.strip() for l in sql.strip().splitlines() if l.strip()]
+    text = " ".join(lines)
+    return text if len(text) <= 110 else text[:107] + "..."
+
+
+class PlanRecorder:
+    """Collects the plan of every explained statement, tagged with the current endpoint"""
+
+    def __init__(self, guarded, table_rows, min_rows):
+        self.guarded = guarded
+        self.table_rows = table_rows
+        self.min_rows = min_rows
+        self.endpoint = None
+        self.statements = []
+
+    def add(self, sql, plan):
+        scans = [
+            node["Relation Name"] for node in walk_plan(plan)
+            if node.get("Node Type") == "Seq Scan"
+            and node.get("Relation Name") in self.guarded
+            and self.table_rows.get(node.get("Relation Name"), 0) > self.min_rows
+        ]
+        self.statements.append({
+            "endpoint": self.endpoint,
+            "sql": sql,
+            "node": plan.get("Node Type"),
+            "cost": plan.get("Total Cost"),
+            "seq_scans": scans,
+        })
+
+
+class ExplainingCursor:
+    """Runs EXPLAIN (FORMAT JSON) before every SELECT, then the statement itself"""
+
+    def __init__(self, cursor, recorder):
+        self._cursor = cursor
+        self._recorder = recorder
+
+    def execute(self, sql, params=None):
+        head = sql.lstrip().upper()
+        if head.startswith(("SELECT", "WITH")) and "INFORMATION_SCHEMA" not in head:
+            self._cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = self._cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            self._recorder.add(sql, plan[0]["Plan"])
+        return self._cursor.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class SharedConnection:
+    """One real connection for the whole run; commits and closes are deferred"""
+
+    def __init__(self, conn, recorder):
+        self._conn = conn
+        self._recorder = recorder
+
+    def cursor(self, *args, **kwargs):
+        return ExplainingCursor(self._conn.cursor(*args, **kwargs), self._recorder)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        pass
+
+
+def pick_fixtures(cur):
+    """The busiest user, their busiest conversation and the hottest group"""
+    cur.execute("""
+        SELECT user1_id FROM conversations
+        GROUP BY user1_id ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    user_id = cur.fetchone()[0]
+    cur.execute("""
+        SELECT c.id, CASE WHEN c.user1_id = %s THEN c.user2_id ELSE c.user1_id END
+        FROM conversations c JOIN messages m ON m.conversation_id = c.id
+        WHERE c.user1_id = %s OR c.user2_id = %s
+        GROUP BY c.id ORDER BY COUNT(*) DESC LIMIT 1
+    """, (user_id, user_id, user_id))
+    conversation_id, other_user_id = cur.fetchone()
+    cur.execute("SELECT group_id FROM group_messages GROUP BY group_id ORDER BY COUNT(*) DESC LIMIT 1")
+    group_id = cur.fetchone()[0]
+    cur.execute("SELECT username FROM users WHERE id = %s", (other_user_id,))
+    other_username = cur.fetchone()[0]
+    return {
+        "user_id": user_id,
+        "conversation_id": conversation_id,
+        "other_user_id": other_user_id,
+        "other_username": other_username,
+        "group_id": group_id,
+    }
+
+
+def endpoints(f):
+    """(label, method, path, json body) for every hot endpoint"""
+    return [
+        ("inbox", "GET", "/conversations", None),
+        ("messages", "GET", f"/conversations/{f['conversation_id']}/messages", None),
+        ("send message", "POST", "/messages", {"conversation_id": f["conversation_id"], "content": "plan check"}),
+        ("like chat", "POST", f"/conversations/{f['conversation_id']}/like", None),
+        ("group directory", "GET", "/groups", None),
+        ("group messages", "GET", f"/groups/{f['group_id']}/messages", None),
+        ("join group", "POST", f"/groups/{f['group_id']}/members", None),
+        ("group info", "GET", f"/groups/{f['group_id']}", None),
+        ("send group message", "POST", f"/groups/{f['group_id']}/messages", {"content": "plan check"}),
+        ("friends", "GET", "/friends", None),
+        ("search", "GET", f"/search-users?q={f['other_username']}", None),
+        ("start conversation", "POST", "/start-conversation", {"user_id": f["other_user_id"]}),
+        ("me", "GET", "/me", None),
+        ("profile", "GET", f"/users/{f['other_user_id']}", None),
+        ("user summaries", "GET", f"/users?ids={f['user_id']},{f['other_user_id']}", None),
+        ("leaderboard", "GET", "/leaderboard", None),
+        ("bootstrap", "GET", "/bootstrap", None),
+    ]
+
+
+def run(args):
+    from database import get_connection, return_connection
+    from app import create_app
+
+    guarded = GUARDED_TABLES + args.table
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)", (guarded,))
+        table_rows = {name: rows for name, rows in cur.fetchall()}
+        fixtures = pick_fixtures(cur)
+        cur.close()
+
+        recorder = PlanRecorder(guarded, table_rows, args.min_rows)
+        shared = SharedConnection(conn, recorder)
+        # Background loaders would run their queries on the shared connection
+        client = create_app({"BACKGROUND_TASKS": False}).test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = fixtures["user_id"]
+
+        with patch_get_connection(lambda: shared, SERVICE_MODULES + ROUTE_MODULES):
+            for label, method, path, body in endpoints(fixtures):
+                recorder.endpoint = label
+                response = client.open(path, method=method, json=body)
+                if response.status_code >= 500:
+                    print(f"[WARNING query_plans] {label}: {method} {path} returned {response.status_code}")
+    finally:
+        conn.rollback()
+        return_connection(conn)
+
+    failures = [s for s in recorder.statements if s["seq_scans"]]
+    for statement in recorder.statements:
+        if args.verbose or statement["seq_scans"]:
+            status = "FAIL" if statement["seq_scans"] else "ok"
+            scans = f" seq scan on {', '.join(statement['seq_scans'])}" if statement["seq_scans"] else ""
+            print(f"{status:4}  [{statement['endpoint']}] {statement['node']} cost={statement['cost']}{scans}")
+            print(f"      {first_line(statement['sql'])}")
+
+    print(f"\nExplained {len(recorder.statements)} statements across {len(endpoints(fixtures))} endpoints; "
+          f"guarded tables: {', '.join(f'{t} (~{int(table_rows.get(t, 0)):,} rows)' for t in guarded)}")
+    if failures:
+        print(f"FAIL: {len(failures)} statement(s) fall back to a sequential scan on a guarded table")
+        return 1
+    print("OK: no sequential scans on guarded tables")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
@@ -0,0 +1,93 @@
+"""
+Shared result handling for the benchmark scripts: percentiles, tables, and
+saving/comparing JSON result files across commits.
+"""
+
+import json
+import math
+import os
+import subprocess
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples):
+    """Latency summary (milliseconds) for a list of samples in seconds"""
+    values = sorted(s * 1000.0 for s in samples)
+    if not values:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def save_results(kind, results, path=None):
+    """Write results to benchmarks/results/<kind>-<revision>.json (or path) and return the path"""
+    payload = {
+        "kind": kind,
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{kind}-{payload['revision']}.json")
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as a fixed-width table"""
+    widths = [max(len(c), *(len(str(r.get(c, ""))) for r in rows)) if rows else len(c) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
+
+
+def print_comparison(baseline, current, metric, higher_is_better=False):
+    """Print metric for every key present in both {name: {metric: value}} maps"""
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        before = baseline[name].get(metric) or 0.0
+        after = current[name].get(metric) or 0.0
+        change = ((after - before) / before * 100.0) if before else 0.0
+        # Ignore noise below 5% when labelling a change
+        if abs(change) < 5:
+            verdict = ""
+        elif (change > 0) == higher_is_better:
+            verdict = " (better)"
+        else:
+            verdict = " (worse)"
+        rows.append({"name": name, "before": before, "after": after, "change": f"{change:+.1f}%{verdict}"})
+    print_table(rows, ["name", "before", "after", "change"])
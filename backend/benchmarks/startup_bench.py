@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Worker cold-start benchmark.
+
+Starts fresh interpreters, the way gunicorn boots a worker, and times in each:
+importing app.py, create_app(), the first /healthz response (the worker can
+serve) and the first 200 from /readyz (pool open, schema checked):
+
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --runs 20 --ready-timeout 30
+    DB_HOST=10.255.255.1 python -m benchmarks.startup_bench --ready-timeout 2
+
+The last form points at an unreachable database: workers should still be
+serving /healthz within milliseconds while /readyz stays 503.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.report import print_table, save_results, summarize
+
+RESULT_PREFIX = "STARTUP_RESULT "
+PHASES = ["import", "create_app", "healthz", "readyz"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time worker start-up in fresh interpreters")
+    parser.add_argument("--runs", type=int, default=10, help="interpreters to start")
+    parser.add_argument("--ready-timeout", type=float, default=30.0,
+                        help="seconds to wait for /readyz before giving up on a run")
+    parser.add_argument("--output", help="where to save the JSON results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def child(args):
+    """One start-up; prints the seconds from the start of the run to each phase"""
+    started = time.perf_counter()
+    timings = {}
+
+    from app import create_app
+    timings["import"] = time.perf_counter() - started
+
+    app = create_app()
+    timings["create_app"] = time.perf_counter() - started
+
+    client = app.test_client()
+    client.get("/healthz")
+    timings["healthz"] = time.perf_counter() - started
+
+    deadline = time.monotonic() + args.ready_timeout
+    while time.monotonic() < deadline:
+        if client.get("/readyz").status_code == 200:
+            timings["readyz"] = time.perf_counter() - started
+            break
+        time.sleep(0.01)
+
+    print(RESULT_PREFIX + json.dumps(timings), flush=True)
+    # Skip interpreter teardown (pool close, daemon threads); it is not start-up
+    os._exit(0)
+
+
+def run(args):
+    samples = {phase: [] for phase in PHASES}
+    not_ready = 0
+    for i in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_bench", "--child",
+             "--ready-timeout", str(args.ready_timeout)],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        ).stdout
+        lines = [line for line in output.splitlines() if line.startswith(RESULT_PREFIX)]
+        if not lines:
+            print(f"FAIL: run {i + 1} printed no result:\n{output[-2000:]}")
+            return 1
+        timings = json.loads(lines[-1][len(RESULT_PREFIX):])
+        for phase, seconds in timings.items():
+            samples[phase].append(seconds)
+        if "readyz" not in timings:
+            not_ready += 1
+
+    results = {phase: summarize(values) for phase, values in samples.items()}
+    print_table([{"phase": phase, **results[phase]} for phase in PHASES],
+                ["phase", "count", "mean_ms", "p50_ms", "p95_ms", "max_ms"])
+    if not_ready:
+        print(f"{not_ready} of {args.runs} runs were not ready within {args.ready_timeout:.0f}s")
+
+    path = save_results("startup", {
+        "config": {"runs": args.runs, "ready_timeout": args.ready_timeout,
+                   "db_host": os.getenv("DB_HOST", "default")},
+        "not_ready": not_ready,
+        "phases": results,
+    }, args.output)
+    print(f"Saved results to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(child(args) if args.child else run(args))
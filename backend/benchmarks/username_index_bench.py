@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the in-process username prefix index (services/username_index.py).
+
+Builds the index from synthetic usernames (no database needed) and reports
+build time, memory (tracemalloc and the index's own estimate), prefix lookup
+latency for 1-4 character prefixes and insert latency:
+
+    python -m benchmarks.username_index_bench
+    python -m benchmarks.username_index_bench --users 1000000 --lookups 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.report import print_table, save_results, summarize
+from services.username_index import UsernameIndex
+
+SYLLABLES = ["ka", "ri", "to", "mo", "an", "el", "su", "ne", "ra", "li", "jo", "xi", "be", "da", "vo", "qu"]
+
+
+def synthetic_usernames(count, rng):
+    """count unique usernames built from syllables, digits and underscores"""
+    seen = set()
+    while len(seen) < count:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.5:
+            name += rng.choice(["", "_"]) + str(rng.randint(0, 9999))
+        if rng.random() < 0.2:
+            name = name.capitalize()
+        seen.add(name)
+    return list(seen)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the username prefix index")
+    parser.add_argument("--users", type=int, default=1_000_000, help="number of usernames to index")
+    parser.add_argument("--lookups", type=int, default=10_000, help="prefix lookups per prefix length")
+    parser.add_argument("--inserts", type=int, default=1_000, help="incremental inserts to time")
+    parser.add_argument("--limit", type=int, default=20, help="results per lookup")
+    parser.add_argument("--max-mb", type=float, default=512, help="memory budget passed to the index")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="where to save the JSON results")
+    return parser.parse_args(argv)
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    names = synthetic_usernames(args.users + args.inserts, rng)
+    initial, extra = names[:args.users], names[args.users:]
+    pairs = [(name, user_id) for user_id, name in enumerate(initial, start=1)]
+
+    index = UsernameIndex(int(args.max_mb * 1024 * 1024))
+    tracemalloc.start()
+    started = time.perf_counter()
+    if not index.load(pairs):
+        print(f"FAIL: {args.users} usernames exceed the {args.max_mb} MB budget")
+        return 1
+    build_seconds = time.perf_counter() - started
+    traced_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Built index of {len(index):,} usernames in {build_seconds:.2f}s; "
+          f"estimate {index.bytes / 1024 / 1024:.1f} MB, traced {traced_bytes / 1024 / 1024:.1f} MB")
+
+    results = {}
+    for length in (1, 2, 3, 4):
+        prefixes = [rng.choice(initial)[:length] for _ in range(args.lookups)]
+        samples = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.search(prefix, args.limit)
+            samples.append(time.perf_counter() - started)
+        results[f"search_prefix_{length}"] = summarize(samples)
+
+    samples = []
+    for offset, name in enumerate(extra):
+        started = time.perf_counter()
+        index.add(name, args.users + offset + 1)
+        samples.append(time.perf_counter() - started)
+    results["insert"] = summarize(samples)
+
+    print_table([{"operation": k, **v} for k, v in results.items()],
+                ["operation", "count", "mean_ms", "p50_ms", "p99_ms", "max_ms"])
+
+    path = save_results("username_index", {
+        "config": {"users": args.users, "limit": args.limit, "seed": args.seed},
+        "build_seconds": round(build_seconds, 3),
+        "estimated_mb": round(index.bytes / 1024 / 1024, 1),
+        "traced_mb": round(traced_bytes / 1024 / 1024, 1),
+        "operations": results,
+    }, args.output)
+    print(f"Saved results to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
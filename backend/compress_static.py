@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Write pre-compressed copies of the static text assets.
+
+For every JS, CSS, SVG and JSON file under static/ this writes file.gz (gzip
+level 9) and, when the Brotli package is installed, file.br (quality 11),
+next to the original. The static route serves them with Content-Encoding
+(see utils/compression.py). Run it as part of every deploy:
+
+    python compress_static.py
+    python compress_static.py --force   # rewrite copies that look up to date
+
+Copies that are not smaller than the original are not written, and a copy
+older than its original is ignored by the server, so a forgotten run only
+costs compression, never serves stale files.
+"""
+
+import argparse
+import gzip
+import os
+import sys
+
+from utils.compression import brotli
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+EXTENSIONS = (".js", ".css", ".svg", ".json")
+MIN_BYTES = 256  # smaller files fit in one packet either way
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-compress static assets")
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    parser.add_argument("--force", action="store_true", help="rewrite copies newer than their original")
+    return parser.parse_args(argv)
+
+
+def encoders():
+    found = {".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        found[".br"] = lambda data: brotli.compress(data, quality=11)
+    return found
+
+
+def compress_file(path, suffix, encode, force):
+    """(original bytes, written bytes) or None when skipped"""
+    target = path + suffix
+    if not force and os.path.isfile(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    compressed = encode(data)
+    if len(compressed) >= len(data):
+        if os.path.isfile(target):
+            os.remove(target)
+        return None
+    with open(target, "wb") as f:
+        f.write(compressed)
+    return len(data), len(compressed)
+
+
+def run(args):
+    found = encoders()
+    if brotli is None:
+        print("[WARNING compress_static] Brotli is not installed; writing .gz only")
+
+    written = 0
+    original_total = {suffix: 0 for suffix in found}
+    compressed_total = {suffix: 0 for suffix in found}
+    for root, _, files in os.walk(args.static_dir):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if not name.endswith(EXTENSIONS) or os.path.getsize(path) < MIN_BYTES:
+                continue
+            for suffix, encode in found.items():
+                sizes = compress_file(path, suffix, encode, args.force)
+                if sizes is None:
+                    continue
+                written += 1
+                original_total[suffix] += sizes[0]
+                compressed_total[suffix] += sizes[1]
+
+    print(f"Wrote {written} compressed files under {args.static_dir}")
+    for suffix in found:
+        if original_total[suffix]:
+            print(f"  {suffix}: {original_total[suffix] / 1024:.1f} KB -> {compressed_total[suffix] / 1024:.1f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
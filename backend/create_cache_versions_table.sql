@@ -0,0 +1,19 @@
+-- Cache versions shared by every worker process (utils/cache.py
+-- SharedVersions). A write that must invalidate a cached value everywhere
+-- bumps its row after committing; every process reads the rows changed since
+-- its last sync (idx_cache_versions_changed_at) about once a second and
+-- compares them with the version its per-process entry was cached at, so
+-- cache reads never query this table.
+CREATE TABLE IF NOT EXISTS cache_versions (
+    cache VARCHAR(32) NOT NULL,
+    cache_key BIGINT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (cache, cache_key)
+);
+
+-- Tables created before changed_at was added
+ALTER TABLE cache_versions ADD COLUMN IF NOT EXISTS changed_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_cache_versions_changed_at
+ON cache_versions (changed_at);
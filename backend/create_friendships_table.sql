@@ -0,0 +1,43 @@
+-- Symmetric friendship edges, one row per direction, maintained by the app
+-- when a conversation is created (services/user_search_service.py) and when a
+-- friend is deleted (services/friend_service.py). Replaces deriving friends
+-- from conversations with an OR-join, so a friend list is one range scan of
+-- the primary key.
+
+CREATE TABLE IF NOT EXISTS friendships (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    friend_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    conversation_id INTEGER REFERENCES conversations(id) ON DELETE SET NULL,
+    hidden BOOLEAN NOT NULL DEFAULT FALSE,  -- friend deleted by user_id
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    hidden_at TIMESTAMP,
+    PRIMARY KEY (user_id, friend_id)
+);
+
+-- Backfill both directions from existing conversations (latest conversation per pair)
+INSERT INTO friendships (user_id, friend_id, conversation_id)
+SELECT a, b, MAX(id)
+FROM (
+    SELECT user1_id AS a, user2_id AS b, id FROM conversations
+    UNION ALL
+    SELECT user2_id AS a, user1_id AS b, id FROM conversations
+) pairs
+WHERE a <> b
+GROUP BY a, b
+ON CONFLICT (user_id, friend_id) DO NOTHING;
+
+-- Carry over friends deleted through the old deleted_friends table
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM information_schema.tables
+        WHERE table_schema = 'public' AND table_name = 'deleted_friends'
+    ) THEN
+        UPDATE friendships f
+        SET hidden = TRUE, hidden_at = df.deleted_at
+        FROM deleted_friends df
+        WHERE f.user_id = df.user_id AND f.friend_id = df.friend_id;
+        RAISE NOTICE 'deleted_friends rows copied to friendships';
+    END IF;
+END $$;
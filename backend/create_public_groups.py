@@ -4,7 +4,7 @@ Script to create 20 public groups in the database
 Run this once to populate the groups table
 """
 
-from database import get_connection
+from database import get_connection, return_connection
 
 GROUP_NAMES = [
     '🗽 New York City',
@@ -51,7 +51,7 @@ def create_public_groups():
             if not creator_id:
                 print("ERROR: No users found in database. Please create a user first.")
                 cur.close()
-                conn.close()
+                return_connection(conn)
                 return
             
             creator_id = creator_id[0]
@@ -72,7 +72,7 @@ def create_public_groups():
     
     conn.commit()
     cur.close()
-    conn.close()
+    return_connection(conn)
     
     print(f"\nSummary:")
     print(f"  Created: {created_count} groups")
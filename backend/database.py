@@ -1,13 +1,123 @@
 import psycopg2
 from psycopg2 import pool
+import psycopg2.extensions
 import time
+from contextlib import contextmanager
 import threading
+import os
+import re
+from utils import metrics
+
+# Connection settings. The defaults point at the hosted Supabase database; set
+# the DB_* environment variables to run against another server, e.g. a local
+# Postgres seeded by benchmarks/generate_data.py
+DB_CONFIG = {
+    "dbname": os.getenv("DB_NAME", "postgres"),
+    "user": os.getenv("DB_USER", "postgres.bddnadfbblbmkjakxbvd"),
+    "password": os.getenv("DB_PASSWORD", "hushhours@123"),
+    "host": os.getenv("DB_HOST", "aws-1-ap-southeast-1.pooler.supabase.com"),
+    "port": os.getenv("DB_PORT", "5432"),
+    "sslmode": os.getenv("DB_SSLMODE", "require"),
+    "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "10"))  # seconds
+}
+
+# Per-request SQL instrumentation. A request is sampled with probability
+# SQL_SAMPLE_RATE; sampled requests over SQL_QUERY_BUDGET statements, or that
+# repeat one statement shape SQL_DUPLICATE_THRESHOLD+ times, are logged
+SQL_SAMPLE_RATE = float(os.getenv("SQL_SAMPLE_RATE", "0.1"))
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "25"))
+SQL_DUPLICATE_THRESHOLD = int(os.getenv("SQL_DUPLICATE_THRESHOLD", "5"))
+
+_query_stats = threading.local()
+_literal_pattern = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_whitespace_pattern = re.compile(r"\s+")
+
+
+def _statement_shape(sql):
+    """Statement text with literals and whitespace normalized, for duplicate detection"""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    return _whitespace_pattern.sub(" ", _literal_pattern.sub("?", str(sql))).strip()
+
+
+class QueryStats:
+    """Statements executed while handling one request"""
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+        self.checkouts = 0
+        self._by_sql = {}
+
+    def record(self, sql, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_sql = sql
+        # Keyed by the raw string: cheap to hash, normalized only when reporting
+        self._by_sql[sql] = self._by_sql.get(sql, 0) + 1
+
+    def duplicates(self, threshold=None):
+        """[(shape, count)] for statement shapes executed at least threshold times"""
+        threshold = threshold or SQL_DUPLICATE_THRESHOLD
+        shapes = {}
+        for sql, count in self._by_sql.items():
+            shape = _statement_shape(sql)
+            shapes[shape] = shapes.get(shape, 0) + count
+        return sorted(
+            ((shape, count) for shape, count in shapes.items() if count >= threshold),
+            key=lambda item: -item[1]
+        )
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        return (
+            f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries", '
+            f'db-slowest;dur={self.slowest_time * 1000:.2f}, '
+            f'db-conn;desc="{self.checkouts} checkouts"'
+        )
+
+
+def start_query_stats():
+    """Start recording statements on this thread (one request)"""
+    _query_stats.current = QueryStats()
+    return _query_stats.current
+
+
+def stop_query_stats():
+    """Stop recording on this thread and return what was recorded, if anything"""
+    stats = getattr(_query_stats, "current", None)
+    _query_stats.current = None
+    return stats
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """Cursor that times each statement into the thread's QueryStats, when one is active"""
+    def execute(self, query, vars=None):
+        stats = getattr(_query_stats, "current", None)
+        if stats is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            stats.record(query, time.perf_counter() - started)
+
+
+# Connection pool configuration. Each process (e.g. gunicorn worker) has its
+# own pool, so the server sees up to workers * DB_POOL_MAXCONN connections;
+# gunicorn.conf.py sizes workers and threads against these
+DB_POOL_MINCONN = int(os.getenv("DB_POOL_MINCONN", "1"))
+DB_POOL_MAXCONN = int(os.getenv("DB_POOL_MAXCONN", "20"))
 
-# Connection pool configuration
 _pool = None
 _pool_lock = threading.Lock()
+_waiters = 0  # threads currently inside get_connection
+_waiters_lock = threading.Lock()
 
-def init_connection_pool():
+def init_connection_pool(minconn=None, maxconn=None):
     """Initialize the connection pool"""
     global _pool
     if _pool is None:
@@ -15,15 +125,10 @@ def init_connection_pool():
             if _pool is None:
                 try:
                     _pool = psycopg2.pool.ThreadedConnectionPool(
-                        minconn=1,
-                        maxconn=20,  # Maximum 20 connections in pool
-                        dbname="postgres",
-                        user="postgres.bddnadfbblbmkjakxbvd",
-                        password="hushhours@123",
-                        host="aws-1-ap-southeast-1.pooler.supabase.com",
-                        port="5432",
-                        sslmode="require",
-                        connect_timeout=10  # 10 second timeout
+                        minconn=minconn or DB_POOL_MINCONN,
+                        maxconn=maxconn or DB_POOL_MAXCONN,
+                        cursor_factory=InstrumentedCursor,
+                        **DB_CONFIG
                     )
                     print("[DEBUG database] Connection pool initialized successfully")
                 except Exception as e:
@@ -33,20 +138,34 @@ def init_connection_pool():
 
 def get_connection():
     """Get a connection from the pool with retry logic"""
+    shared = getattr(_request_conn, "conn", None)
+    if shared is not None:
+        return shared
+
     pool = init_connection_pool()
-    
+
+    stats = getattr(_query_stats, "current", None)
+    if stats is not None:
+        stats.checkouts += 1
+
+    global _waiters
+    with _waiters_lock:
+        _waiters += 1
+    started = time.perf_counter()
+    try:
+        return _acquire_connection(pool)
+    finally:
+        metrics.DB_POOL_WAIT.observe(time.perf_counter() - started)
+        with _waiters_lock:
+            _waiters -= 1
+
+def _acquire_connection(pool):
+    """Check a connection out of the pool with retries, falling back to a direct connection"""
     if pool is None:
         # Fallback to direct connection if pool fails
         print("[WARNING database] Using direct connection (pool unavailable)")
-        return psycopg2.connect(
-            dbname="postgres",
-            user="postgres.bddnadfbblbmkjakxbvd",
-            password="hushhours@123",
-            host="aws-1-ap-southeast-1.pooler.supabase.com",
-            port="5432",
-            sslmode="require",
-            connect_timeout=10
-        )
+        metrics.DB_POOL_FALLBACKS.inc()
+        return psycopg2.connect(cursor_factory=InstrumentedCursor, **DB_CONFIG)
     
     # Retry logic for getting connection from pool
     max_retries = 3
@@ -66,16 +185,9 @@ def get_connection():
             else:
                 # Last attempt failed, try direct connection
                 print("[WARNING database] Pool exhausted, using direct connection")
+                metrics.DB_POOL_FALLBACKS.inc()
                 try:
-                    return psycopg2.connect(
-                        dbname="postgres",
-                        user="postgres.bddnadfbblbmkjakxbvd",
-                        password="hushhours@123",
-                        host="aws-1-ap-southeast-1.pooler.supabase.com",
-                        port="5432",
-                        sslmode="require",
-                        connect_timeout=10
-                    )
+                    return psycopg2.connect(cursor_factory=InstrumentedCursor, **DB_CONFIG)
                 except Exception as direct_error:
                     print(f"[ERROR database] Direct connection also failed: {direct_error}")
                     raise
@@ -85,7 +197,7 @@ def get_connection():
 def return_connection(conn):
     """Return a connection to the pool"""
     global _pool
-    if not conn:
+    if not conn or conn is getattr(_request_conn, "conn", None):
         return
     
     if _pool:
@@ -105,6 +217,215 @@ def return_connection(conn):
         except:
             pass
 
+# One connection shared by every get_connection() on a thread, for endpoints
+# that call several services (e.g. /bootstrap): one checkout and one
+# SELECT 1 health check instead of one per service
+_request_conn = threading.local()
+
+class TransactionConnection:
+    """Shared connection of request_connection()
+
+    Each unit of work on it (a /batch item) runs between begin_item() and
+    end_item() under a savepoint, so an item that fails, leaves the
+    transaction aborted or returns without committing is undone without
+    touching the next one. A service's rollback() only undoes work since
+    its item began, as a rollback would for that service on its own.
+    commit() commits, unless atomic: then it is deferred to the end of the
+    block, and setting failed rolls everything back instead. Callbacks
+    given to on_commit() then wait for that commit too.
+    """
+    def __init__(self, conn, atomic=False):
+        self._conn = conn
+        self.atomic = atomic
+        self.failed = False
+        self._in_item = False
+        self._item_callbacks = []
+        self.after_commit = []  # run by request_connection after the final commit
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def _execute(self, sql):
+        cur = self._conn.cursor()
+        cur.execute(sql)
+        cur.close()
+
+    def begin_item(self):
+        self._execute("SAVEPOINT request_item")
+        self._in_item = True
+        self._item_callbacks = []
+
+    def on_commit(self, callback):
+        if not self.atomic:
+            callback()
+        elif self._in_item:
+            self._item_callbacks.append(callback)
+        else:
+            self.after_commit.append(callback)
+
+    def end_item(self, ok):
+        """Keep (ok) or undo the item's work since begin_item() and drop its savepoint"""
+        self._in_item = False
+        if ok:
+            self.after_commit.extend(self._item_callbacks)
+        self._item_callbacks = []
+        try:
+            if not ok:
+                self._execute("ROLLBACK TO SAVEPOINT request_item")
+            self._execute("RELEASE SAVEPOINT request_item")
+        except psycopg2.Error as e:
+            print(f"[WARNING database] Could not end request item, rolling back: {e}")
+            self._conn.rollback()
+            self.failed = True
+            self.after_commit = []
+
+    def commit(self):
+        if self.atomic:
+            return
+        self._conn.commit()
+        if self._in_item:
+            # The commit ended the savepoint; keep guarding the rest of the item
+            self._execute("SAVEPOINT request_item")
+
+    def rollback(self):
+        if self._in_item:
+            self._execute("ROLLBACK TO SAVEPOINT request_item")
+        else:
+            self._conn.rollback()
+
+@contextmanager
+def request_connection(atomic=False):
+    """Serve get_connection() on this thread from a single connection until exit
+
+    Services still commit or roll back their own work, unless atomic: then
+    they share one transaction (see TransactionConnection), committed when
+    the block exits without an exception and not marked failed.
+    return_connection() leaves the shared connection alone and it is
+    returned here. Nested use reuses the outer connection.
+    """
+    if getattr(_request_conn, "conn", None) is not None:
+        yield _request_conn.conn
+        return
+    conn = get_connection()
+    shared = TransactionConnection(conn, atomic)
+    _request_conn.conn = shared
+    committed = False
+    try:
+        yield shared
+        if atomic:
+            if shared.failed:
+                conn.rollback()
+            else:
+                conn.commit()
+                committed = True
+    finally:
+        _request_conn.conn = None
+        return_connection(conn)  # putconn rolls back an open transaction
+    # Only now can other requests read the new rows
+    if committed:
+        for callback in shared.after_commit:
+            callback()
+
+def on_commit(callback):
+    """Run callback once this thread's writes so far are committed
+
+    Right away, except inside an atomic request_connection(), where it waits
+    for the final commit and is dropped on rollback. Cache invalidation goes
+    through here, so no reader can cache pre-commit rows under the new
+    version.
+    """
+    shared = getattr(_request_conn, "conn", None)
+    if shared is None:
+        callback()
+    else:
+        shared.on_commit(callback)
+
+def pool_stats():
+    """Connection pool occupancy, for the /metrics gauges"""
+    pool = _pool
+    if pool is None:
+        return {"in_use": 0, "idle": 0, "max": 0, "waiters": _waiters}
+    return {
+        "in_use": len(pool._used),
+        "idle": len(pool._pool),
+        "max": pool.maxconn,
+        "waiters": _waiters
+    }
+
+def init_app(app):
+    """Size the pool from app.config, warm it up in the background and close it at exit
+
+    Nothing here waits for the database, so a slow or unreachable server does
+    not hold up worker boot. Requests that need a connection before the
+    warm-up finishes open the pool themselves in get_connection (or wait for
+    the warm-up holding _pool_lock).
+    """
+    import atexit
+    global DB_POOL_MINCONN, DB_POOL_MAXCONN
+    DB_POOL_MINCONN = app.config.get("DB_POOL_MINCONN", DB_POOL_MINCONN)
+    DB_POOL_MAXCONN = app.config.get("DB_POOL_MAXCONN", DB_POOL_MAXCONN)
+    atexit.register(close_all_connections)
+    start_warm_up()
+
+# Readiness, reported by /readyz: the pool is open and REQUIRED_TABLES exist.
+# The warm-up thread retries with backoff (up to WARM_UP_MAX_DELAY seconds
+# apart) until both hold
+REQUIRED_TABLES = ("users", "conversations", "messages", "groups", "group_members", "group_messages")
+WARM_UP_MAX_DELAY = 30
+_readiness = {"schema": False, "missing_tables": [], "error": None}
+_warm_up_started = False
+_ready_event = threading.Event()
+
+def start_warm_up():
+    """Open the pool and check the schema in a daemon thread; safe to call twice"""
+    global _warm_up_started
+    with _pool_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=_warm_up, name="db-warm-up", daemon=True).start()
+
+def _warm_up():
+    started = time.perf_counter()
+    delay = 0.5
+    while not (init_connection_pool() is not None and check_schema()):
+        time.sleep(delay)
+        delay = min(delay * 2, WARM_UP_MAX_DELAY)
+    _ready_event.set()
+    print(f"[DEBUG database] Ready in {time.perf_counter() - started:.2f}s")
+
+def wait_until_ready(timeout=None):
+    """Block until the warm-up has succeeded (starting it if needed); False on timeout"""
+    start_warm_up()
+    return _ready_event.wait(timeout)
+
+def check_schema():
+    """Check REQUIRED_TABLES through the pool and record the result; True when all exist"""
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor()
+        missing = [name for name in REQUIRED_TABLES if not table_exists(cur, name)]
+        cur.close()
+    except Exception as e:
+        _readiness.update(error=str(e))
+        return False
+    finally:
+        return_connection(conn)
+    if missing:
+        print(f"[WARNING database] Missing tables: {', '.join(missing)}")
+    _readiness.update(schema=not missing, missing_tables=missing, error=None)
+    return not missing
+
+def readiness():
+    """{"ready", "pool", "schema", "missing_tables", "error"} for /readyz"""
+    pool_open = _pool is not None
+    return {
+        "ready": pool_open and _readiness["schema"],
+        "pool": pool_open,
+        **_readiness,
+    }
+
 def close_all_connections():
     """Close all connections in the pool (for cleanup)"""
     global _pool
@@ -117,6 +438,48 @@ def close_all_connections():
         finally:
             _pool = None
 
+# Cached schema probes. Optional tables and columns are added by the SQL
+# scripts, so code checks for them; a table that exists is remembered for the
+# life of the process, a missing one is re-checked after SCHEMA_PROBE_TTL
+SCHEMA_PROBE_TTL = 60  # seconds
+_schema_cache = {}
+
+def _schema_probe(cur, key, sql, params):
+    cached = _schema_cache.get(key)
+    if cached is not None and (cached[0] or time.monotonic() - cached[1] < SCHEMA_PROBE_TTL):
+        return cached[0]
+    cur.execute(sql, params)
+    exists = cur.fetchone() is not None
+    _schema_cache[key] = (exists, time.monotonic())
+    return exists
+
+def table_exists(cur, table_name):
+    """Whether public.<table_name> exists, using cur only on a cache miss"""
+    return _schema_probe(
+        cur,
+        ("table", table_name),
+        "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = %s",
+        (table_name,)
+    )
+
+def column_exists(cur, table_name, column_name):
+    """Whether <table_name>.<column_name> exists, using cur only on a cache miss"""
+    return _schema_probe(
+        cur,
+        ("column", table_name, column_name),
+        "SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+        (table_name, column_name)
+    )
+
+def index_exists(cur, index_name):
+    """Whether public.<index_name> exists, using cur only on a cache miss"""
+    return _schema_probe(
+        cur,
+        ("index", index_name),
+        "SELECT 1 FROM pg_indexes WHERE schemaname = 'public' AND indexname = %s",
+        (index_name,)
+    )
+
 class DatabaseConnection:
     """Context manager for database connections"""
     def __init__(self):
@@ -0,0 +1,55 @@
+"""
+gunicorn settings, sized against the database connection budget.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers are processes (one per core runs Python in parallel); each has its
+own pool of DB_POOL_MAXCONN connections and GUNICORN_THREADS request threads.
+Requests hold a pool connection while they run, so threads are kept at
+DB_POOL_MAXCONN minus the connections used by background work (username
+index and leaderboard loaders, password rehashes); with more threads than
+that, busy workers fall back to unpooled connections. Workers are capped so
+that workers * DB_POOL_MAXCONN stays within DB_MAX_CONNECTIONS, the number of
+connections the database (or Supabase pooler) allows this app.
+
+gthread workers are used because psycopg2 blocks; gevent workers would need
+psycopg2 patched for cooperative I/O (e.g. psycogreen) and are not supported.
+"""
+
+import os
+
+DB_POOL_MAXCONN = int(os.getenv("DB_POOL_MAXCONN", "20"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "60"))
+BACKGROUND_CONNECTIONS = 3  # username index, leaderboard, rehash
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+worker_class = "gthread"
+workers = int(os.getenv(
+    "GUNICORN_WORKERS",
+    str(max(1, min(os.cpu_count() or 1, DB_MAX_CONNECTIONS // DB_POOL_MAXCONN)))
+))
+threads = int(os.getenv("GUNICORN_THREADS", str(max(1, DB_POOL_MAXCONN - BACKGROUND_CONNECTIONS))))
+
+# The pool and background threads must be created in each worker, not
+# inherited across fork
+preload_app = False
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    total = workers * DB_POOL_MAXCONN
+    print(f"[DEBUG gunicorn] {workers} workers x {threads} threads, "
+          f"up to {total} database connections (DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS})")
+    if total > DB_MAX_CONNECTIONS:
+        print(f"[WARNING gunicorn] {workers} workers x DB_POOL_MAXCONN={DB_POOL_MAXCONN} "
+              f"exceeds DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS}")
+    if threads + BACKGROUND_CONNECTIONS > DB_POOL_MAXCONN:
+        print(f"[WARNING gunicorn] {threads} threads can exhaust DB_POOL_MAXCONN={DB_POOL_MAXCONN}; "
+              f"busy requests will open unpooled connections")
+
+
+def worker_exit(server, worker):
+    from database import close_all_connections
+    close_all_connections()
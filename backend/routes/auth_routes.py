@@ -1,12 +1,33 @@
 from flask import Blueprint, request, jsonify, session
-from services.auth_service import register_user, login_user, get_user_by_id
+from services.auth_service import register_user, login_user
+from utils.password_hashing import HashingBusy
+from utils import rate_limit
 
 auth_bp = Blueprint("auth", __name__)
 
 
+@auth_bp.errorhandler(HashingBusy)
+def hashing_busy(error):
+    # The bcrypt pool is saturated: shed the request instead of queueing it
+    response = jsonify({"success": False, "error": "Server busy, please try again"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def too_many_attempts(retry_after):
+    response = jsonify({"success": False, "error": "Too many attempts, please try again later"})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+
 
 @auth_bp.route("/register", methods=["POST"])
 def register():
+    # Throttle before any bcrypt or database work
+    retry_after = rate_limit.check((rate_limit.REGISTER_PER_IP, request.remote_addr))
+    if retry_after:
+        return too_many_attempts(retry_after)
+
     data = request.json
 
     username = data.get("username")
@@ -34,11 +55,10 @@ def register():
     )
 
     if success:
-        user = get_user_by_id(result)  # register_user now returns user_id on success
-        if user:
-            session["user_id"] = user["id"]
-            session.permanent = True  # Make session persistent
-            print(f"Session set for user_id: {user['id']}")
+        user = result  # register_user returns the new user's profile on success
+        session["user_id"] = user["id"]
+        session.permanent = True  # Make session persistent
+        print(f"Session set for user_id: {user['id']}")
         return jsonify({ "success": True})
     else:
         return jsonify({ "success": False, "error": result }), 400
@@ -52,6 +72,14 @@ def login():
     username = data.get("username")
     password = data.get("password")
 
+    # Throttle before any bcrypt or database work
+    retry_after = rate_limit.check(
+        (rate_limit.LOGIN_PER_IP, request.remote_addr),
+        (rate_limit.LOGIN_PER_USERNAME, str(username)[:100] if username else None),
+    )
+    if retry_after:
+        return too_many_attempts(retry_after)
+
     success, user = login_user(username, password)
 
     if not success:
@@ -0,0 +1,108 @@
+from flask import Blueprint, current_app, jsonify, request, session
+from werkzeug.exceptions import HTTPException
+
+from database import request_connection
+
+batch_bp = Blueprint("batch", __name__)
+
+BATCH_MAX_REQUESTS = 20
+
+# Blueprints whose routes may be called from a batch. Auth routes change the
+# session, which a sub-request cannot send back
+BATCH_BLUEPRINTS = {"chat", "group", "user"}
+
+# Writes that may share one all-or-nothing transaction: their only side
+# effects outside the database are cache bumps. Gifts are left out because
+# they also update the in-memory leaderboard
+ATOMIC_ENDPOINTS = {
+    "chat.send_message",
+    "chat.like_conversation",
+    "chat.unlike_conversation",
+    "group.create_new_group",
+    "group.send_message",
+    "group.add_member",
+    "group.like_group",
+    "group.unlike_group",
+    "user.update_avatar",
+    "user.remove_friend",
+    "user.start_conversation",
+    "user.save_message_color",
+}
+
+
+@batch_bp.route("/batch", methods=["POST"])
+def batch():
+    """Run several API calls in one HTTP request
+
+    Body: {"requests": [{"method", "path", "body"}], "atomic": false}. Every
+    item runs on one pooled connection, under a savepoint that is rolled
+    back when the item fails (status >= 400). With atomic, items must be
+    writes from ATOMIC_ENDPOINTS and share one transaction: the first item
+    that fails rolls back all of them and the rest are skipped.
+    """
+    if not session.get("user_id"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    data = request.json or {}
+    items = data.get("requests")
+    atomic = bool(data.get("atomic"))
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "requests must be a non-empty list"}), 400
+    if len(items) > BATCH_MAX_REQUESTS:
+        return jsonify({"error": f"At most {BATCH_MAX_REQUESTS} requests per batch"}), 400
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str) or not item["path"].startswith("/"):
+            return jsonify({"error": "Each request needs a path starting with /"}), 400
+
+    responses = []
+    with request_connection(atomic=atomic) as conn:
+        for item in items:
+            if atomic and conn.failed:
+                responses.append({"status": 424, "body": {"error": "Skipped after an earlier failure"}})
+                continue
+            # Each item runs under a savepoint: one that fails (or leaves the
+            # transaction aborted) is undone without breaking the next
+            conn.begin_item()
+            status, body = _dispatch(item, atomic)
+            conn.end_item(status < 400)
+            responses.append({"status": status, "body": body})
+            if atomic and status >= 400:
+                conn.failed = True
+
+    result = {"responses": responses}
+    if atomic:
+        result["committed"] = not conn.failed
+    return jsonify(result)
+
+
+def _dispatch(item, atomic):
+    """(status, body) of one sub-request, run through the app's URL map with the caller's session"""
+    method = str(item.get("method", "GET")).upper()
+    with current_app.test_request_context(
+        item["path"],
+        method=method,
+        json=item.get("body"),
+        headers={"Cookie": request.headers.get("Cookie", "")}
+    ) as ctx:
+        if ctx.request.routing_exception is not None:
+            error = ctx.request.routing_exception
+            return getattr(error, "code", 400), {"error": getattr(error, "name", "Bad request")}
+        endpoint = ctx.request.url_rule.endpoint
+        if ctx.request.blueprint not in BATCH_BLUEPRINTS:
+            return 400, {"error": f"{method} {item['path']} cannot be batched"}
+        if atomic and endpoint not in ATOMIC_ENDPOINTS:
+            return 400, {"error": f"{method} {item['path']} cannot be part of an atomic batch"}
+
+        try:
+            response = current_app.make_response(current_app.dispatch_request())
+        except HTTPException as e:
+            return e.code, {"error": e.name}
+        except Exception as e:
+            print(f"[DEBUG batch] {method} {item['path']} failed: {e}")
+            return 500, {"error": "Internal error"}
+
+    body = response.get_json(silent=True)
+    if body is None:
+        body = response.get_data(as_text=True)
+    return response.status_code, body
@@ -0,0 +1,43 @@
+from flask import Blueprint, jsonify, session
+
+from database import request_connection
+from services.auth_service import get_user_by_id
+from services.chat_service import get_conversations_for_user
+from services.friend_service import get_cached_friends
+from services.group_service import get_all_public_groups
+
+bootstrap_bp = Blueprint("bootstrap", __name__)
+
+
+@bootstrap_bp.route("/bootstrap")
+def bootstrap():
+    """Everything the app needs for its first screen in one request
+
+    Same data as /me, /message-color, /conversations, /friends and /groups,
+    read on one pooled connection. The profile (and the message colour in it)
+    and friends list come from their caches when warm.
+    """
+    user_id = session.get("user_id")
+
+    if not user_id:
+        return jsonify({"error": "Not logged in"}), 401
+
+    with request_connection():
+        user = get_user_by_id(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        conversations = get_conversations_for_user(user_id)
+        friends, _ = get_cached_friends(user_id)
+        groups = get_all_public_groups(user_id)
+
+    response = jsonify({
+        "me": user,
+        "message_color": user["message_color"],
+        "conversations": conversations,
+        "friends": friends,
+        "groups": groups
+    })
+    # Conversations change with every message; never reuse a stored copy
+    response.headers["Cache-Control"] = "no-store"
+    return response
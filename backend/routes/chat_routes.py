@@ -1,9 +1,11 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, make_response, request, session
 from services.chat_service import (
+    get_conversation_messages_etag,
+    get_conversations_etag,
     get_conversations_for_user,
     get_messages_for_conversation
 )
-from database import get_connection
+from database import get_connection, return_connection
 
 chat_bp = Blueprint("chat", __name__)
 
@@ -14,15 +16,24 @@ def conversations():
     if not user_id:
         return jsonify({"error": "Not logged in"}), 401
 
-    print(f"[DEBUG chat_routes] Fetching conversations for user_id: {user_id} (type: {type(user_id)})")
-    data = get_conversations_for_user(user_id)
-    print(f"[DEBUG chat_routes] Returning {len(data)} conversations to frontend")
-    for i, conv in enumerate(data):
-        if conv.get('is_group'):
-            print(f"  {i+1}. Group {conv.get('group_id')}: {conv.get('other_display_name', 'Unknown')}")
-        else:
-            print(f"  {i+1}. Conversation {conv.get('conversation_id')} with user: {conv.get('other_username', conv.get('other_display_name', 'Unknown'))} (id: {conv.get('other_user_id')}), last_msg: {conv.get('last_message_time')}")
-    return jsonify(data)
+    etag = get_conversations_etag(user_id)
+
+    # Nothing new since the browser's copy: skip the full inbox query
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        print(f"[DEBUG chat_routes] Fetching conversations for user_id: {user_id} (type: {type(user_id)})")
+        data = get_conversations_for_user(user_id)
+        print(f"[DEBUG chat_routes] Returning {len(data)} conversations to frontend")
+        for i, conv in enumerate(data):
+            if conv.get('is_group'):
+                print(f"  {i+1}. Group {conv.get('group_id')}: {conv.get('other_display_name', 'Unknown')}")
+            else:
+                print(f"  {i+1}. Conversation {conv.get('conversation_id')} with user: {conv.get('other_username', conv.get('other_display_name', 'Unknown'))} (id: {conv.get('other_user_id')}), last_msg: {conv.get('last_message_time')}")
+        response = jsonify(data)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 
@@ -33,24 +44,18 @@ def conversation_messages(conversation_id):
     if not user_id:
         return jsonify({"error": "Not logged in"}), 401
 
-    # Verify user is part of this conversation
-    from database import get_connection
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT id FROM conversations WHERE id = %s AND (user1_id = %s OR user2_id = %s)",
-        (conversation_id, user_id, user_id)
-    )
-    if not cur.fetchone():
-        cur.close()
-        conn.close()
+    # Verify user is part of this conversation; the same query yields the tag
+    etag = get_conversation_messages_etag(conversation_id, user_id)
+    if etag is None:
         return jsonify({"error": "Conversation not found or access denied"}), 403
-    
-    cur.close()
-    conn.close()
 
-    messages = get_messages_for_conversation(conversation_id)
-    return jsonify(messages)
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        response = jsonify(get_messages_for_conversation(conversation_id))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 
@@ -69,7 +74,7 @@ def send_message():
         return jsonify({"error": "Missing conversation_id or content"}), 400
 
     # Verify user is part of this conversation
-    from database import get_connection
+    from database import get_connection, return_connection
     conn = get_connection()
     cur = conn.cursor()
     
@@ -79,7 +84,7 @@ def send_message():
     )
     if not cur.fetchone():
         cur.close()
-        conn.close()
+        return_connection(conn)
         return jsonify({"error": "Conversation not found or access denied"}), 403
 
     # Get user's message color
@@ -134,7 +139,7 @@ def send_message():
     
     conn.commit()
     cur.close()
-    conn.close()
+    return_connection(conn)
 
     return jsonify({"success": True})
 
@@ -156,7 +161,7 @@ def like_conversation(conversation_id):
     )
     if not cur.fetchone():
         cur.close()
-        conn.close()
+        return_connection(conn)
         return jsonify({"error": "Conversation not found or access denied"}), 403
 
     # Check if already liked
@@ -166,7 +171,7 @@ def like_conversation(conversation_id):
     )
     if cur.fetchone():
         cur.close()
-        conn.close()
+        return_connection(conn)
         return jsonify({"success": True, "is_liked": True})
 
     # Add to liked chats
@@ -176,7 +181,7 @@ def like_conversation(conversation_id):
     )
     conn.commit()
     cur.close()
-    conn.close()
+    return_connection(conn)
 
     return jsonify({"success": True, "is_liked": True})
 
@@ -198,7 +203,7 @@ def unlike_conversation(conversation_id):
     )
     if not cur.fetchone():
         cur.close()
-        conn.close()
+        return_connection(conn)
         return jsonify({"error": "Conversation not found or access denied"}), 403
 
     # Remove from liked chats
@@ -208,7 +213,7 @@ def unlike_conversation(conversation_id):
     )
     conn.commit()
     cur.close()
-    conn.close()
+    return_connection(conn)
 
     return jsonify({"success": True, "is_liked": False})
 
@@ -1,8 +1,9 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, make_response, request, session
 from services.group_service import (
     create_group,
     get_all_public_groups,
     get_group_messages,
+    get_group_messages_etag,
     send_group_message,
     get_group_info,
     add_member_to_group
@@ -52,19 +53,28 @@ def get_messages(group_id):
     if not user_id:
         return jsonify({"error": "Not logged in"}), 401
 
+    etag = get_group_messages_etag(group_id)
+    if etag is None:
+        return jsonify({"error": "Group not found"}), 404
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
     messages = get_group_messages(group_id, user_id)
 
     # Allow viewing messages even if not a member (for public groups)
     # Return empty array if group doesn't exist, otherwise return messages
     if messages is None:
         # Check if group exists
-        from database import get_connection
+        from database import get_connection, return_connection
         conn = get_connection()
         cur = conn.cursor()
         cur.execute("SELECT id FROM groups WHERE id = %s", (group_id,))
         group_exists = cur.fetchone()
         cur.close()
-        conn.close()
+        return_connection(conn)
         
         if not group_exists:
             return jsonify({"error": "Group not found"}), 404
@@ -72,7 +82,10 @@ def get_messages(group_id):
         # Group exists but user can't view messages (shouldn't happen for public groups)
         return jsonify([])  # Return empty array instead of error
 
-    return jsonify(messages)
+    response = jsonify(messages)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 @group_bp.route("/groups/<int:group_id>/messages", methods=["POST"])
@@ -119,26 +132,20 @@ def add_member(group_id):
         return jsonify({"error": "Not logged in"}), 401
 
     # Verify group exists
-    from database import get_connection
+    from database import get_connection, return_connection
     conn = get_connection()
     cur = conn.cursor()
     
     try:
         cur.execute("SELECT id FROM groups WHERE id = %s", (group_id,))
         if not cur.fetchone():
-            cur.close()
-            conn.close()
             return jsonify({"error": "Group not found"}), 404
-        cur.close()
-        conn.close()
     except Exception as e:
         print(f"[DEBUG group_routes] Error checking group: {e}")
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
         return jsonify({"error": "Failed to verify group"}), 500
+    finally:
+        cur.close()
+        return_connection(conn)
 
     # Use session user_id instead of request body
     # Allow users to join public groups (no need to be a member first)
@@ -157,7 +164,7 @@ def like_group(group_id):
     if not user_id:
         return jsonify({"error": "Not logged in"}), 401
 
-    from database import get_connection
+    from database import get_connection, return_connection
     conn = get_connection()
     cur = conn.cursor()
     
@@ -165,8 +172,6 @@ def like_group(group_id):
         # Verify group exists
         cur.execute("SELECT id FROM groups WHERE id = %s", (group_id,))
         if not cur.fetchone():
-            cur.close()
-            conn.close()
             return jsonify({"error": "Group not found"}), 404
 
         # Check if liked_groups table exists
@@ -180,8 +185,6 @@ def like_group(group_id):
         liked_groups_table_exists = cur.fetchone()[0]
         
         if not liked_groups_table_exists:
-            cur.close()
-            conn.close()
             return jsonify({"error": "Liked groups feature not available yet. Please create the liked_groups table."}), 503
 
         # Check if already liked
@@ -190,8 +193,6 @@ def like_group(group_id):
             (user_id, group_id)
         )
         if cur.fetchone():
-            cur.close()
-            conn.close()
             return jsonify({"success": True, "is_liked": True})
 
         # Add to liked groups
@@ -200,19 +201,15 @@ def like_group(group_id):
             (user_id, group_id)
         )
         conn.commit()
-        cur.close()
-        conn.close()
 
         return jsonify({"success": True, "is_liked": True})
     except Exception as e:
         print(f"[DEBUG group_routes] Error liking group: {e}")
-        try:
-            conn.rollback()
-            cur.close()
-            conn.close()
-        except:
-            pass
+        conn.rollback()
         return jsonify({"error": "Failed to like group"}), 500
+    finally:
+        cur.close()
+        return_connection(conn)
 
 
 @group_bp.route("/groups/<int:group_id>/like", methods=["DELETE"])
@@ -222,7 +219,7 @@ def unlike_group(group_id):
     if not user_id:
         return jsonify({"error": "Not logged in"}), 401
 
-    from database import get_connection
+    from database import get_connection, return_connection
     conn = get_connection()
     cur = conn.cursor()
     
@@ -230,8 +227,6 @@ def unlike_group(group_id):
         # Verify group exists
         cur.execute("SELECT id FROM groups WHERE id = %s", (group_id,))
         if not cur.fetchone():
-            cur.close()
-            conn.close()
             return jsonify({"error": "Group not found"}), 404
 
         # Check if liked_groups table exists
@@ -245,8 +240,6 @@ def unlike_group(group_id):
         liked_groups_table_exists = cur.fetchone()[0]
         
         if not liked_groups_table_exists:
-            cur.close()
-            conn.close()
             return jsonify({"error": "Liked groups feature not available yet. Please create the liked_groups table."}), 503
 
         # Remove from liked groups
@@ -255,17 +248,13 @@ def unlike_group(group_id):
             (user_id, group_id)
         )
         conn.commit()
-        cur.close()
-        conn.close()
 
         return jsonify({"success": True, "is_liked": False})
     except Exception as e:
         print(f"[DEBUG group_routes] Error unliking group: {e}")
-        try:
-            conn.rollback()
-            cur.close()
-            conn.close()
-        except:
-            pass
+        conn.rollback()
         return jsonify({"error": "Failed to unlike group"}), 500
+    finally:
+        cur.close()
+        return_connection(conn)
 
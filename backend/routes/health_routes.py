@@ -0,0 +1,26 @@
+from flask import Blueprint, jsonify
+
+from database import readiness
+from services.leaderboard import LEADERBOARD
+from services.username_index import USERNAME_INDEX
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/healthz")
+def healthz():
+    """Liveness: the process is serving requests. Never touches the database"""
+    return jsonify({"status": "ok"})
+
+
+@health_bp.route("/readyz")
+def readyz():
+    """Readiness: the pool is open and the required tables exist (503 until then)
+
+    The in-memory indexes are reported too, but do not affect readiness: both
+    have database fallbacks while they load.
+    """
+    state = readiness()
+    state["username_index"] = USERNAME_INDEX.ready
+    state["leaderboard"] = LEADERBOARD.ready
+    return jsonify(state), 200 if state["ready"] else 503
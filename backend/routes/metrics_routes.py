@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+from utils.metrics import render
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (text exposition format)"""
+    return Response(render(), mimetype="text/plain; version=0.0.4")
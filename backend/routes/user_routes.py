@@ -1,8 +1,11 @@
-from flask import Blueprint, jsonify, request, session
-from services.auth_service import get_user_by_id
-from services.friend_service import get_friends_for_user, delete_friend
-from services.user_search_service import search_users_by_username, get_or_create_conversation
-from database import get_connection
+from flask import Blueprint, jsonify, make_response, request, session
+from services.auth_service import get_user_by_id, get_user_summaries, invalidate_profile
+from services.friend_service import get_cached_friends, delete_friend
+from services.gift_service import send_gift
+from services.group_service import bump_member_groups
+from services.leaderboard import get_leaderboard, record_points
+from services.user_search_service import search_users_by_username, suggest_usernames, get_or_create_conversation
+from database import get_connection, return_connection, column_exists
 
 user_bp = Blueprint("user", __name__)
 
@@ -43,10 +46,13 @@ def update_avatar():
         "UPDATE users SET avatar_key = %s WHERE id = %s",
         (avatar, user_id)
     )
+    # Group messages show the sender's avatar
+    bump_member_groups(cur, user_id)
 
     conn.commit()
     cur.close()
-    conn.close()
+    return_connection(conn)
+    invalidate_profile(user_id)
 
     return jsonify({"success": True, "avatar": avatar})
 
@@ -58,10 +64,18 @@ def get_friends():
     if not user_id:
         return jsonify({"error": "Not logged in"}), 401
 
-    print(f"[DEBUG user_routes] /friends endpoint called for user_id: {user_id}")
-    friends = get_friends_for_user(user_id)
-    print(f"[DEBUG user_routes] Returning {len(friends)} friends")
-    return jsonify(friends)
+    friends, etag = get_cached_friends(user_id)
+
+    # Unchanged list: answer from the cache without a body
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        print(f"[DEBUG user_routes] Returning {len(friends)} friends for user {user_id}")
+        response = jsonify(friends)
+    response.set_etag(etag)
+    # Let the browser keep the list but revalidate it on every request
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 @user_bp.route("/friends/<int:friend_id>", methods=["DELETE"])
@@ -91,8 +105,23 @@ def search_users():
     if not search_term or len(search_term) < 1:
         return jsonify([])
 
-    users = search_users_by_username(search_term, user_id)
-    return jsonify(users)
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    # Lightweight prefix suggestions straight from the in-memory index
+    if request.args.get("suggest") == "1":
+        return jsonify(suggest_usernames(search_term, user_id, limit=limit))
+
+    users, next_cursor = search_users_by_username(
+        search_term, user_id, limit=limit, cursor=request.args.get("cursor")
+    )
+    response = jsonify(users)
+    # Pass back as ?cursor= for the next page of prefix matches
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
 
 
 @user_bp.route("/start-conversation", methods=["POST"])
@@ -115,29 +144,18 @@ def start_conversation():
     except (ValueError, TypeError):
         return jsonify({"error": "Invalid user_id format"}), 400
 
-    print(f"[DEBUG start-conversation] user_id={user_id} (type: {type(user_id)}), other_user_id={other_user_id} (type: {type(other_user_id)})")
-    
-    # Verify other user exists
-    from database import get_connection
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM users WHERE id = %s", (other_user_id,))
-    other_user = cur.fetchone()
-    cur.close()
-    conn.close()
-    
-    if not other_user:
-        print(f"[DEBUG start-conversation] ERROR: Other user {other_user_id} does not exist!")
-        return jsonify({"error": "User not found"}), 404
+    # get_or_create_conversation also checks that the other user exists
+    success, result = get_or_create_conversation(user_id, other_user_id)
 
-    conversation_id = get_or_create_conversation(user_id, other_user_id)
-    
-    if conversation_id:
-        print(f"[DEBUG start-conversation] Successfully created/found conversation: {conversation_id}")
-        return jsonify({"success": True, "conversation_id": conversation_id})
+    if success:
+        return jsonify({"success": True, "conversation_id": result})
+    elif result == "User not found":
+        return jsonify({"error": result}), 404
+    elif result == "Cannot start a conversation with yourself":
+        return jsonify({"error": result}), 400
     else:
-        print(f"[DEBUG start-conversation] ERROR: Failed to create conversation")
-        return jsonify({"error": "Failed to create conversation"}), 500
+        print(f"[DEBUG start-conversation] ERROR: {result}")
+        return jsonify({"error": result}), 500
 
 
 @user_bp.route("/message-color", methods=["GET"])
@@ -147,39 +165,10 @@ def get_message_color():
     if not user_id:
         return jsonify({"error": "Not logged in"}), 401
 
-    conn = get_connection()
-    cur = conn.cursor()
-
-    try:
-        # Check if message_color column exists
-        cur.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='users' AND column_name='message_color'
-        """)
-        column_exists = cur.fetchone()
-        
-        if not column_exists:
-            # Column doesn't exist, return default
-            cur.close()
-            conn.close()
-            return jsonify({"color": "#6b7280"})  # Default grey
-        
-        # Get user's message color
-        cur.execute("SELECT message_color FROM users WHERE id = %s", (user_id,))
-        result = cur.fetchone()
-        
-        message_color = result[0] if result and result[0] else "#6b7280"  # Default grey
-        
-        cur.close()
-        conn.close()
-        
-        return jsonify({"color": message_color})
-    except Exception as e:
-        print(f"[DEBUG get_message_color] Error: {e}")
-        cur.close()
-        conn.close()
-        return jsonify({"color": "#6b7280"})  # Default grey on error
+    # From the cached profile, which probes for the column with the cached
+    # column_exists and defaults to grey
+    user = get_user_by_id(user_id)
+    return jsonify({"color": user["message_color"] if user else "#6b7280"})
 
 
 @user_bp.route("/message-color", methods=["POST"])
@@ -204,17 +193,9 @@ def save_message_color():
     cur = conn.cursor()
 
     try:
-        # Check if message_color column exists, if not create it
-        cur.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='users' AND column_name='message_color'
-        """)
-        column_exists = cur.fetchone()
-        
-        if not column_exists:
-            # Add the column
-            cur.execute("ALTER TABLE users ADD COLUMN message_color VARCHAR(7) DEFAULT '#6b7280'")
+        # Create the message_color column if it does not exist yet
+        if not column_exists(cur, "users", "message_color"):
+            cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS message_color VARCHAR(7) DEFAULT '#6b7280'")
             conn.commit()
         
         # Update user's message color
@@ -224,16 +205,45 @@ def save_message_color():
         )
 
         conn.commit()
-        cur.close()
-        conn.close()
-
-        return jsonify({"success": True, "color": color})
     except Exception as e:
         print(f"[DEBUG save_message_color] Error: {e}")
         conn.rollback()
-        cur.close()
-        conn.close()
         return jsonify({"error": "Failed to save message color"}), 500
+    finally:
+        cur.close()
+        return_connection(conn)
+
+    invalidate_profile(user_id)
+    return jsonify({"success": True, "color": color})
+
+
+USERS_MAX_IDS = 500
+
+
+@user_bp.route("/users")
+def get_users():
+    """Compact profiles for many users: /users?ids=1,2,3"""
+    current_user_id = session.get("user_id")
+
+    if not current_user_id:
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        ids = [int(part) for part in request.args.get("ids", "").split(",") if part.strip()]
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of user ids"}), 400
+
+    ids = list(dict.fromkeys(ids))  # drop duplicates, keep order
+    if len(ids) > USERS_MAX_IDS:
+        return jsonify({"error": f"At most {USERS_MAX_IDS} ids per request"}), 400
+    if not ids:
+        return jsonify([])
+
+    try:
+        return jsonify(get_user_summaries(ids))
+    except Exception as e:
+        print(f"[DEBUG get_users] Error: {e}")
+        return jsonify({"error": "Failed to load users"}), 500
 
 
 @user_bp.route("/users/<int:user_id>")
@@ -269,3 +279,53 @@ def get_user_profile(user_id):
         "gifts": gifts
     })
 
+
+
+@user_bp.route("/users/<int:user_id>/gifts", methods=["POST"])
+def send_user_gift(user_id):
+    """Send a gift to another user, paid with the sender's points"""
+    current_user_id = session.get("user_id")
+
+    if not current_user_id:
+        return jsonify({"error": "Not logged in"}), 401
+
+    data = request.json or {}
+    gift_type = data.get("gift_type")
+
+    if not gift_type:
+        return jsonify({"error": "gift_type is required"}), 400
+
+    success, result = send_gift(int(current_user_id), user_id, gift_type)
+
+    if success:
+        # Sender's points and recipient's gift counts changed
+        invalidate_profile(current_user_id)
+        invalidate_profile(user_id)
+        record_points(int(current_user_id), result)
+        return jsonify({"success": True, "hush_points": result})
+    elif result == "User not found":
+        return jsonify({"error": result}), 404
+    elif result in ("Failed to send gift", "Gifts are not available"):
+        return jsonify({"error": result}), 500
+    else:
+        return jsonify({"error": result}), 400
+
+
+@user_bp.route("/leaderboard")
+def leaderboard():
+    """Top users by points and the current user's rank"""
+    current_user_id = session.get("user_id")
+
+    if not current_user_id:
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+
+    try:
+        return jsonify(get_leaderboard(limit, current_user_id))
+    except Exception as e:
+        print(f"[DEBUG leaderboard] Error: {e}")
+        return jsonify({"error": "Failed to load leaderboard"}), 500
@@ -1,45 +1,99 @@
-import bcrypt
-from database import get_connection
-from services.gift_service import get_user_gifts
+import os
+
+from database import get_connection, return_connection, column_exists, index_exists, on_commit, table_exists
+from utils.cache import SharedVersions, VersionedCache
+from utils.password_hashing import check_password, hash_password, needs_rehash, rehash_in_background
+from services import leaderboard, username_index
+
+# Profiles (user row + gifts) per user id, bumped by avatar, message colour
+# and gift changes in every worker (shared versions); the TTL covers points
+# changed elsewhere
+PROFILE_CACHE = VersionedCache(
+    "profile",
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "60")),
+    shared=SharedVersions("profile")
+)
+
+# Compact profiles (name, avatar, message colour) for rendering senders and
+# members, bumped with PROFILE_CACHE
+USER_SUMMARY_CACHE = VersionedCache(
+    "user_summary",
+    ttl=float(os.getenv("USER_SUMMARY_CACHE_TTL", "30")),
+    max_entries=50000
+)
+
+
+# Unique index on users.username: UNIQUE in the README schema, or created by
+# add_users_username_unique.sql
+USERNAME_UNIQUE_INDEXES = ("users_username_key", "idx_users_username_unique")
+
+
+def _has_unique_username_index(cur):
+    return any(index_exists(cur, name) for name in USERNAME_UNIQUE_INDEXES)
 
 
 def register_user(username, display_name, age, gender, password, avatar):
+    """Create a user; returns (True, profile) or (False, error)"""
+    # hash password using bcrypt, on the bcrypt pool and before taking a
+    # database connection
+    hashed_password_str = hash_password(password)
+
     conn = get_connection()
     cur = conn.cursor()
 
-    cur.execute(""" SELECT id FROM users WHERE username = %s """, (username,))
-    
-    row = cur.fetchone()
+    try:
+        message_color_sql = "message_color" if column_exists(cur, "users", "message_color") else "NULL"
 
-    if row:
-        cur.close()
-        conn.close()
-        return False, "Username already taken"
-    
-    # hash password using bcrypt
-    password_bytes = password.encode("utf-8")
-    hashed_password = bcrypt.hashpw(
-        password_bytes,
-        bcrypt.gensalt()
-    )
-    hashed_password_str = hashed_password.decode("utf-8")
+        if not _has_unique_username_index(cur):
+            # Without the index ON CONFLICT cannot see a taken username;
+            # check first (two concurrent sign-ups can still both get in)
+            print("[WARNING register_user] No unique index on users.username; "
+                  "apply add_users_username_unique.sql")
+            cur.execute("SELECT 1 FROM users WHERE username = %s", (username,))
+            if cur.fetchone():
+                return False, "Username already taken"
 
-    # insert new user
-    cur.execute(
-        """
-        INSERT INTO users (username, display_name, password, avatar_key, age, gender, points)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        RETURNING id
-        """,
-        (username, display_name, hashed_password_str, avatar, age, gender, 0)
-    )
+        # insert new user; the unique index on username turns a taken (or
+        # concurrently registered) username into no row instead of an error
+        cur.execute(
+            f"""
+            INSERT INTO users (username, display_name, password, avatar_key, age, gender, points)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT DO NOTHING
+            RETURNING id, username, display_name, avatar_key, age, gender, points, {message_color_sql}
+            """,
+            (username, display_name, hashed_password_str, avatar, age, gender, 0)
+        )
 
-    user_id = cur.fetchone()[0]
-    conn.commit()
-    cur.close()
-    conn.close()
+        row = cur.fetchone()
+        conn.commit()
+    except Exception as e:
+        print(f"[DEBUG register_user] Error: {e}")
+        conn.rollback()
+        return False, "Registration failed"
+    finally:
+        cur.close()
+        return_connection(conn)
+
+    if not row:
+        return False, "Username already taken"
 
-    return True, user_id
+    user = {
+        "id": row[0],
+        "username": row[1],
+        "display_name": row[2],
+        "avatar": row[3],
+        "age": row[4],
+        "gender": row[5],
+        "hush_points": row[6] or 0,
+        "gifts": {},
+        "message_color": row[7] or "#6b7280"  # Default grey
+    }
+    # A new user's profile is complete as returned; /me needs no query
+    PROFILE_CACHE.set(user["id"], user, PROFILE_CACHE.version(user["id"]))
+    username_index.add_user(username, user["id"])
+    leaderboard.record_points(user["id"], user["hush_points"])
+    return True, {**user, "gifts": {}}
 
 
 def login_user(username, password):
@@ -54,7 +108,7 @@ def login_user(username, password):
     row = cur.fetchone()
 
     cur.close()
-    conn.close()
+    return_connection(conn)
 
     if not row:
         return False, None
@@ -63,80 +117,149 @@ def login_user(username, password):
     stored_hashed_password = row[1]
     avatar_key = row[2]
 
-    password_bytes = password.encode("utf-8")
-    stored_hash_bytes = stored_hashed_password.encode("utf-8")
-
-    is_correct = bcrypt.checkpw(password_bytes, stored_hash_bytes)
-
-    if not is_correct:
+    if not check_password(password, stored_hashed_password):
         return False, None
 
+    # Hashes from before a BCRYPT_ROUNDS change are upgraded in the background
+    if needs_rehash(stored_hashed_password):
+        rehash_in_background(
+            password,
+            lambda new_hash: _store_rehashed_password(user_id, stored_hashed_password, new_hash)
+        )
+
     return True, {
         "id": user_id,
         "avatar": avatar_key
     }
 
 
+def _store_rehashed_password(user_id, old_hash, new_hash):
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        # Only replace the hash we verified, in case the password changed meanwhile
+        cur.execute(
+            "UPDATE users SET password = %s WHERE id = %s AND password = %s",
+            (new_hash, user_id, old_hash)
+        )
+        conn.commit()
+        cur.close()
+    finally:
+        return_connection(conn)
+
+
 
 def get_user_by_id(user_id):
+    """Profile (user row + gifts) for /me and /users/<id>, from PROFILE_CACHE when fresh"""
+    try:
+        user_id = int(user_id)
+    except (ValueError, TypeError):
+        return None
+
+    cached = PROFILE_CACHE.get(user_id)
+    if cached is None:
+        version = PROFILE_CACHE.version(user_id)
+        cached = _load_profile(user_id)
+        if cached is None:
+            return None
+        PROFILE_CACHE.set(user_id, cached, version)
+
+    # Callers may modify the result; keep the cached copy intact
+    return {**cached, "gifts": dict(cached["gifts"])}
+
+
+def invalidate_profile(user_id):
+    """Drop the cached profile; call after committing a change to the user or their gifts"""
+    user_id = int(user_id)
+
+    def bump():
+        PROFILE_CACHE.bump(user_id)
+        USER_SUMMARY_CACHE.bump(user_id)
+    on_commit(bump)
+
+
+def get_user_summaries(user_ids):
+    """Compact profiles for many users, from USER_SUMMARY_CACHE or one ANY() query
+
+    Returns them in the order of user_ids; unknown ids are left out.
+    """
+    found = USER_SUMMARY_CACHE.get_many(user_ids)
+    missing = [user_id for user_id in user_ids if user_id not in found]
+
+    if missing:
+        versions = USER_SUMMARY_CACHE.versions(missing)
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            message_color_sql = "message_color" if column_exists(cur, "users", "message_color") else "NULL"
+            cur.execute(f"""
+                SELECT id, username, display_name, avatar_key, {message_color_sql}
+                FROM users
+                WHERE id = ANY(%s)
+            """, (missing,))
+            loaded = {
+                row[0]: {
+                    "id": row[0],
+                    "username": row[1],
+                    "display_name": row[2] or row[1],
+                    "avatar": row[3],
+                    "message_color": row[4] or "#6b7280"  # Default grey
+                }
+                for row in cur.fetchall()
+            }
+            cur.close()
+        finally:
+            return_connection(conn)
+        USER_SUMMARY_CACHE.set_many(loaded, versions)
+        found.update(loaded)
+
+    return [found[user_id] for user_id in user_ids if user_id in found]
+
+
+def _load_profile(user_id):
+    """User row and gift counts in one query; None if the user does not exist"""
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        # Check if message_color column exists
-        cur.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='users' AND column_name='message_color'
-        """)
-        column_exists = cur.fetchone() is not None
-        
-        if column_exists:
-            cur.execute(
-                "SELECT id, username, display_name, avatar_key, age, gender, points, message_color FROM users WHERE id = %s",
-                (user_id,)
-            )
-        else:
-            cur.execute(
-                "SELECT id, username, display_name, avatar_key, age, gender, points FROM users WHERE id = %s",
-                (user_id,)
-            )
+        has_message_color = column_exists(cur, "users", "message_color")
+        has_gifts = table_exists(cur, "user_gifts")
 
-        row = cur.fetchone()
+        message_color_sql = "u.message_color" if has_message_color else "NULL"
+        gifts_sql = """
+            (SELECT json_object_agg(g.gift_type, g.total ORDER BY g.gift_type)
+             FROM (SELECT gift_type, SUM(count) AS total
+                   FROM user_gifts WHERE user_id = u.id
+                   GROUP BY gift_type) g)
+        """ if has_gifts else "NULL"
 
-        cur.close()
-        conn.close()
-
-        if not row:
-            return None
+        cur.execute(f"""
+            SELECT u.id, u.username, u.display_name, u.avatar_key, u.age, u.gender, u.points,
+                   {message_color_sql} AS message_color,
+                   {gifts_sql} AS gifts
+            FROM users u
+            WHERE u.id = %s
+        """, (user_id,))
 
-        # Get user gifts (with error handling)
-        try:
-            gifts = get_user_gifts(row[0])
-        except Exception as e:
-            print(f"[DEBUG auth_service] Error getting gifts: {e}")
-            gifts = {}
-
-        user_data = {
-            "id": row[0],
-            "username": row[1],
-            "display_name": row[2],
-            "avatar": row[3],
-            "age": row[4],
-            "gender": row[5],
-            "hush_points": row[6] or 0,
-            "gifts": gifts
-        }
-        
-        # Add message_color if column exists
-        if column_exists and len(row) > 7:
-            user_data["message_color"] = row[7] if row[7] else "#6b7280"  # Default grey
-        else:
-            user_data["message_color"] = "#6b7280"  # Default grey
-        
-        return user_data
+        row = cur.fetchone()
     except Exception as e:
         print(f"[DEBUG get_user_by_id] Error: {e}")
+        return None
+    finally:
         cur.close()
-        conn.close()
+        return_connection(conn)
+
+    if not row:
         return None
+
+    return {
+        "id": row[0],
+        "username": row[1],
+        "display_name": row[2],
+        "avatar": row[3],
+        "age": row[4],
+        "gender": row[5],
+        "hush_points": row[6] or 0,
+        "gifts": row[8] or {},
+        "message_color": row[7] or "#6b7280"  # Default grey
+    }
@@ -1,6 +1,8 @@
-from database import get_connection
+from database import get_connection, return_connection, table_exists
 from datetime import datetime
 
+from utils.cache import etag_for
+
 def get_conversations_for_user(user_id):
     conn = get_connection()
     cur = conn.cursor()
@@ -25,14 +27,9 @@ def get_conversations_for_user(user_id):
     if not user_exists:
         print(f"[DEBUG chat.py] ERROR: User {user_id} does not exist in database!")
         cur.close()
-        conn.close()
+        return_connection(conn)
         return []
     
-    # First, check ALL conversations in database
-    cur.execute("SELECT COUNT(*) FROM conversations")
-    total_convos = cur.fetchone()[0]
-    print(f"[DEBUG chat.py] Total conversations in entire database: {total_convos}")
-    
     # Check all conversations for this user
     cur.execute("""
         SELECT id, user1_id, user2_id 
@@ -144,7 +141,7 @@ def get_conversations_for_user(user_id):
         print(f"[DEBUG chat_service] Added conversation {conv_data['conversation_id']} with {conv_data['other_display_name']} (user_id: {conv_data['other_user_id']})")
 
     cur.close()
-    conn.close()
+    return_connection(conn)
     
     # Debug: Log conversation order with last message times
     print(f"[DEBUG chat_service] Returning {len(conversations)} conversations:")
@@ -191,6 +188,87 @@ def get_conversations_for_user(user_id):
     return conversations
 
 
+def get_conversations_etag(user_id):
+    """ETag for get_conversations_for_user, from ids and names only
+
+    Covers, per conversation and joined group: the newest message id, the
+    other user's name and avatar (or the group name) and the liked flag.
+    Each newest id is one probe of idx_messages_conversation_id /
+    idx_group_messages_group_id; no message content is read.
+    """
+    user_id = int(user_id)
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT
+                c.id,
+                (SELECT MAX(id) FROM messages WHERE conversation_id = c.id),
+                u.username,
+                u.display_name,
+                u.avatar_key,
+                EXISTS (SELECT 1 FROM liked_chats lc
+                        WHERE lc.conversation_id = c.id AND lc.user_id = %s)
+            FROM conversations c
+            JOIN users u
+              ON u.id = CASE WHEN c.user1_id = %s THEN c.user2_id ELSE c.user1_id END
+            WHERE c.user1_id = %s OR c.user2_id = %s
+            ORDER BY c.id
+        """, (user_id, user_id, user_id, user_id))
+        conversations = cur.fetchall()
+
+        liked_sql = """
+            EXISTS (SELECT 1 FROM liked_groups lg
+                    WHERE lg.group_id = g.id AND lg.user_id = %(user_id)s)
+        """ if table_exists(cur, "liked_groups") else "FALSE"
+        cur.execute(f"""
+            SELECT
+                g.id,
+                g.name,
+                (SELECT MAX(id) FROM group_messages WHERE group_id = g.id),
+                {liked_sql}
+            FROM groups g
+            JOIN group_members gm ON gm.group_id = g.id AND gm.user_id = %(user_id)s
+            ORDER BY g.id
+        """, {"user_id": user_id})
+        groups = cur.fetchall()
+        cur.close()
+    finally:
+        return_connection(conn)
+
+    return etag_for([user_id, conversations, groups])
+
+
+def get_conversation_messages_etag(conversation_id, user_id):
+    """ETag for get_messages_for_conversation, or None if user_id is not in the conversation
+
+    Messages are only ever appended, so the newest id stands for the list;
+    the participants' avatars are added because each message carries its
+    sender's. One query that also serves as the access check.
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT
+                (SELECT MAX(id) FROM messages WHERE conversation_id = c.id),
+                u1.avatar_key,
+                u2.avatar_key
+            FROM conversations c
+            JOIN users u1 ON u1.id = c.user1_id
+            JOIN users u2 ON u2.id = c.user2_id
+            WHERE c.id = %s AND (c.user1_id = %s OR c.user2_id = %s)
+        """, (conversation_id, user_id, user_id))
+        row = cur.fetchone()
+        cur.close()
+    finally:
+        return_connection(conn)
+
+    if not row:
+        return None
+    return etag_for([conversation_id, list(row)])
+
+
 def get_messages_for_conversation(conversation_id):
     conn = get_connection()
     cur = conn.cursor()
@@ -240,7 +318,7 @@ def get_messages_for_conversation(conversation_id):
 
     rows = cur.fetchall()
     cur.close()
-    conn.close()
+    return_connection(conn)
 
     print(f"[DEBUG chat_service] message_color_column_exists: {message_color_column_exists}")
     print(f"[DEBUG chat_service] Fetched {len(rows)} messages")
@@ -1,7 +1,26 @@
-from database import get_connection
+import os
+
+from database import get_connection, return_connection, on_commit, table_exists
+from utils.cache import SharedVersions, VersionedCache, etag_for
+
+# Friend lists per user id. Bumped in every worker (shared versions, synced
+# in the background so a hit or a 304 issues no SQL) when a conversation is
+# created and when a friend is deleted; the TTL bounds staleness of friends'
+# avatars and points
+FRIENDS_CACHE = VersionedCache(
+    "friends",
+    ttl=float(os.getenv("FRIENDS_CACHE_TTL", "30")),
+    shared=SharedVersions("friends")
+)
 
 def get_friends_for_user(user_id):
     """Get all friends (users the current user has chatted with)"""
+    friends = _load_friends(user_id)
+    return friends if friends is not None else []
+
+
+def _load_friends(user_id):
+    """Friends of user_id, or None if the query failed"""
     # Ensure user_id is an integer
     if not user_id:
         print(f"[DEBUG friend_service] user_id is None or falsy")
@@ -13,40 +32,28 @@ def get_friends_for_user(user_id):
         print(f"[DEBUG friend_service] user_id cannot be converted to int: {user_id}")
         return []
     
-    print(f"[DEBUG friend_service] Getting friends for user_id: {user_id} (type: {type(user_id)})")
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        # First, check how many conversations this user has
-        cur.execute("""
-            SELECT COUNT(*) FROM conversations 
-            WHERE user1_id = %s OR user2_id = %s
-        """, (user_id, user_id))
-        conv_count = cur.fetchone()[0]
-        print(f"[DEBUG friend_service] User {user_id} has {conv_count} conversations")
-        
-        # Test query to see what conversations exist
-        cur.execute("""
-            SELECT id, user1_id, user2_id FROM conversations 
-            WHERE user1_id = %s OR user2_id = %s
-            LIMIT 5
-        """, (user_id, user_id))
-        test_convos = cur.fetchall()
-        print(f"[DEBUG friend_service] Sample conversations: {test_convos}")
-        
-        # Check if deleted_friends table exists
-        cur.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = 'deleted_friends'
-            )
-        """)
-        table_exists = cur.fetchone()[0]
-        print(f"[DEBUG friend_service] deleted_friends table exists: {table_exists}")
-
-        if table_exists:
+        if table_exists(cur, "friendships"):
+            # One row per friend in the edge table: a primary key range scan
+            # on (user_id, friend_id) instead of an OR-join over conversations
+            cur.execute("""
+                SELECT 
+                    u.id AS friend_id,
+                    u.username,
+                    u.display_name,
+                    u.avatar_key,
+                    u.points,
+                    f.conversation_id
+                FROM friendships f
+                JOIN users u ON u.id = f.friend_id
+                WHERE f.user_id = %s
+                AND NOT f.hidden
+                ORDER BY COALESCE(u.display_name, u.username) ASC
+            """, (user_id,))
+        elif table_exists(cur, "deleted_friends"):
             # Get all users the current user has had conversations with, excluding deleted friends
             # Use GROUP BY instead of DISTINCT to allow ORDER BY
             cur.execute("""
@@ -71,7 +78,7 @@ def get_friends_for_user(user_id):
                 ORDER BY COALESCE(u.display_name, u.username) ASC
             """, (user_id, user_id, user_id, user_id, user_id))
         else:
-            # Table doesn't exist yet, just get all friends without filtering
+            # Neither table exists yet, just get all friends without filtering
             # Use GROUP BY instead of DISTINCT to allow ORDER BY
             cur.execute("""
                 SELECT 
@@ -92,71 +99,99 @@ def get_friends_for_user(user_id):
             """, (user_id, user_id, user_id, user_id))
 
         rows = cur.fetchall()
-        print(f"[DEBUG friend_service] Found {len(rows)} friends")
-        
-        friends = []
-        for row in rows:
-            friend_data = {
-                "friend_id": row[0],
-                "username": row[1],
-                "display_name": row[2] or row[1],
-                "avatar": row[3],
-                "points": row[4] or 0,
-                "conversation_id": row[5]
-            }
-            print(f"[DEBUG friend_service] Friend: {friend_data['display_name']} (id: {friend_data['friend_id']}, conv: {friend_data['conversation_id']})")
-            friends.append(friend_data)
-
-        cur.close()
-        conn.close()
-        print(f"[DEBUG friend_service] Returning {len(friends)} friends")
-        return friends
-        
     except Exception as e:
         print(f"[DEBUG friend_service] Error getting friends: {e}")
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
-        return []
+        return None
+    finally:
+        cur.close()
+        return_connection(conn)
+
+    friends = []
+    for row in rows:
+        friends.append({
+            "friend_id": row[0],
+            "username": row[1],
+            "display_name": row[2] or row[1],
+            "avatar": row[3],
+            "points": row[4] or 0,
+            "conversation_id": row[5]
+        })
+
+    print(f"[DEBUG friend_service] Returning {len(friends)} friends for user {user_id}")
+    return friends
+
+
+def get_cached_friends(user_id):
+    """(friends, etag) for user_id, from FRIENDS_CACHE when fresh"""
+    user_id = int(user_id)
+    cached = FRIENDS_CACHE.get(user_id)
+    if cached is not None:
+        return cached
+
+    version = FRIENDS_CACHE.version(user_id)
+    friends = _load_friends(user_id)
+    if friends is None:
+        # Not cached, so the next request retries the query
+        friends = []
+        return friends, etag_for(friends)
+    result = (friends, etag_for(friends))
+    FRIENDS_CACHE.set(user_id, result, version)
+    return result
+
+
+def invalidate_friends(*user_ids):
+    """Drop cached friend lists; call after committing a change to friendships"""
+    user_ids = [int(user_id) for user_id in user_ids]
+
+    def bump():
+        for user_id in user_ids:
+            FRIENDS_CACHE.bump(user_id)
+    on_commit(bump)
 
 
 def delete_friend(user_id, friend_id):
-    """Delete a friend (mark as deleted in friends table or remove from list)"""
-    # For now, we'll create a deleted_friends table to track deleted friends
-    # This way we can filter them out but keep the conversation history
+    """Delete a friend (hide them from the list but keep the conversation history)"""
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        # Check if deleted_friends table exists, if not create it
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS deleted_friends (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                friend_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, friend_id)
-            )
-        """)
-        conn.commit()
+        if table_exists(cur, "friendships"):
+            # Hide this direction of the edge only; the friend still sees us
+            cur.execute("""
+                INSERT INTO friendships (user_id, friend_id, hidden, hidden_at)
+                VALUES (%s, %s, TRUE, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id, friend_id)
+                DO UPDATE SET hidden = TRUE, hidden_at = CURRENT_TIMESTAMP
+            """, (user_id, friend_id))
+        else:
+            # Before create_friendships_table.sql is applied, track deleted
+            # friends in deleted_friends and filter them out on read
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS deleted_friends (
+                    id SERIAL PRIMARY KEY,
+                    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    friend_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(user_id, friend_id)
+                )
+            """)
+            conn.commit()
 
-        # Insert into deleted_friends
-        cur.execute("""
-            INSERT INTO deleted_friends (user_id, friend_id)
-            VALUES (%s, %s)
-            ON CONFLICT (user_id, friend_id) DO NOTHING
-        """, (user_id, friend_id))
+            # Insert into deleted_friends
+            cur.execute("""
+                INSERT INTO deleted_friends (user_id, friend_id)
+                VALUES (%s, %s)
+                ON CONFLICT (user_id, friend_id) DO NOTHING
+            """, (user_id, friend_id))
 
         conn.commit()
-        cur.close()
-        conn.close()
-        return True
     except Exception as e:
         print(f"[DEBUG friend_service] Error deleting friend: {e}")
         conn.rollback()
-        cur.close()
-        conn.close()
         return False
+    finally:
+        cur.close()
+        return_connection(conn)
 
+    invalidate_friends(user_id)
+    return True
@@ -1,47 +1,126 @@
-from database import get_connection
+import os
+import random
+
+from database import get_connection, return_connection, column_exists, table_exists
+
+# Points it costs to send each gift type
+GIFT_COSTS = {"🎁": 10, "💝": 25, "🌹": 50, "⭐": 100}
+GIFT_COUNTER_SHARDS = int(os.getenv("GIFT_COUNTER_SHARDS", "8"))
 
 def get_user_gifts(user_id):
     """Get all gifts for a user with their counts"""
-    try:
-        conn = get_connection()
-        cur = conn.cursor()
+    conn = get_connection()
+    cur = conn.cursor()
 
-        # Check if table exists first
-        cur.execute(
-            """
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = 'user_gifts'
-            )
-            """
-        )
-        table_exists = cur.fetchone()[0]
-
-        if not table_exists:
-            cur.close()
-            conn.close()
+    try:
+        if not table_exists(cur, "user_gifts"):
             return {}
 
+        # Counters may be split over several shard rows per gift type
         cur.execute(
             """
-            SELECT gift_type, count 
+            SELECT gift_type, SUM(count) 
             FROM user_gifts 
             WHERE user_id = %s
+            GROUP BY gift_type
             ORDER BY gift_type
             """,
             (user_id,)
         )
 
         rows = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        # Convert to dictionary for easy lookup
-        gifts_dict = {row[0]: row[1] for row in rows}
-        return gifts_dict
     except Exception as e:
         print(f"[DEBUG gift_service] Error fetching gifts: {e}")
         # Return empty dict if there's any error (table doesn't exist, etc.)
         return {}
+    finally:
+        cur.close()
+        return_connection(conn)
+
+    # Convert to dictionary for easy lookup
+    gifts_dict = {row[0]: row[1] for row in rows}
+    return gifts_dict
+
 
+
+def send_gift(sender_id, recipient_id, gift_type):
+    """Debit the sender and count the gift for the recipient in one statement
+
+    Returns (True, sender's remaining points) or (False, error).
+    """
+    cost = GIFT_COSTS.get(gift_type)
+    if cost is None:
+        return False, "Unknown gift type"
+    if sender_id == recipient_id:
+        return False, "You cannot send a gift to yourself"
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        if not table_exists(cur, "user_gifts"):
+            return False, "Gifts are not available"
+
+        params = {
+            "sender": sender_id,
+            "recipient": recipient_id,
+            "gift": gift_type,
+            "cost": cost,
+            "shard": random.randrange(GIFT_COUNTER_SHARDS),
+        }
+        if column_exists(cur, "user_gifts", "shard"):
+            counter_sql = """
+                INSERT INTO user_gifts (user_id, gift_type, shard, count)
+                SELECT %(recipient)s, %(gift)s, %(shard)s, 1 FROM debit
+                ON CONFLICT (user_id, gift_type, shard) DO UPDATE SET count = user_gifts.count + 1
+            """
+        else:
+            # Before add_gift_sending.sql: one counter row per gift type
+            counter_sql = """
+                INSERT INTO user_gifts (user_id, gift_type, count)
+                SELECT %(recipient)s, %(gift)s, 1 FROM debit
+                ON CONFLICT (user_id, gift_type) DO UPDATE SET count = user_gifts.count + 1
+            """
+        ledger_sql = """
+            , ledger AS (
+                INSERT INTO points_ledger (user_id, delta, balance, reason, gift_type, counterparty_id)
+                SELECT %(sender)s, -%(cost)s, points, 'gift_sent', %(gift)s, %(recipient)s FROM debit
+            )
+        """ if table_exists(cur, "points_ledger") else ""
+
+        # The sender's row is the only row lock taken (besides one counter
+        # shard); every part runs only if the debit succeeded
+        cur.execute(f"""
+            WITH debit AS (
+                UPDATE users SET points = points - %(cost)s
+                WHERE id = %(sender)s
+                AND points >= %(cost)s
+                AND EXISTS (SELECT 1 FROM users WHERE id = %(recipient)s)
+                RETURNING points
+            ),
+            counter AS (
+                {counter_sql}
+            )
+            {ledger_sql}
+            SELECT points FROM debit
+        """, params)
+        row = cur.fetchone()
+
+        if row:
+            conn.commit()
+            return True, row[0]
+
+        # Nothing changed: work out why
+        conn.rollback()
+        cur.execute("SELECT EXISTS (SELECT 1 FROM users WHERE id = %s)", (recipient_id,))
+        recipient_exists = cur.fetchone()[0]
+        if not recipient_exists:
+            return False, "User not found"
+        return False, "Not enough points"
+    except Exception as e:
+        print(f"[DEBUG gift_service] Error sending gift: {e}")
+        conn.rollback()
+        return False, "Failed to send gift"
+    finally:
+        cur.close()
+        return_connection(conn)
@@ -1,6 +1,8 @@
-from database import get_connection
+from database import get_connection, return_connection, column_exists
 from datetime import datetime
 
+from utils.cache import etag_for
+
 def create_group(group_name, created_by_user_id):
     """Create a new group"""
     conn = get_connection()
@@ -24,8 +26,6 @@ def create_group(group_name, created_by_user_id):
         """, (group_id, created_by_user_id))
 
         conn.commit()
-        cur.close()
-        conn.close()
 
         return {
             "id": group[0],
@@ -36,9 +36,10 @@ def create_group(group_name, created_by_user_id):
     except Exception as e:
         print(f"[DEBUG group_service] Error creating group: {e}")
         conn.rollback()
-        cur.close()
-        conn.close()
         return None
+    finally:
+        cur.close()
+        return_connection(conn)
 
 
 def get_all_public_groups(user_id):
@@ -166,9 +167,6 @@ def get_all_public_groups(user_id):
         total_groups = cur.fetchone()[0]
         print(f"[DEBUG group_service] Total groups in database: {total_groups}")
         
-        cur.close()
-        conn.close()
-
         groups = []
         for row in rows:
             groups.append({
@@ -185,12 +183,52 @@ def get_all_public_groups(user_id):
         return groups
     except Exception as e:
         print(f"[DEBUG group_service] Error getting groups: {e}")
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
         return []
+    finally:
+        cur.close()
+        return_connection(conn)
+
+
+def get_group_messages_etag(group_id):
+    """ETag for get_group_messages, or None if the group does not exist
+
+    Built from the newest message id (one probe of idx_group_messages_group_id)
+    and the group's profiles_version, which bump_member_groups() changes when
+    a member's avatar does, since each message carries its sender's.
+    """
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        # Before add_groups_profiles_version.sql an avatar change shows up
+        # with the group's next message
+        profiles_version_sql = "g.profiles_version" if column_exists(cur, "groups", "profiles_version") else "0"
+        cur.execute(f"""
+            SELECT
+                (SELECT MAX(id) FROM group_messages WHERE group_id = g.id),
+                {profiles_version_sql}
+            FROM groups g
+            WHERE g.id = %s
+        """, (group_id,))
+        row = cur.fetchone()
+        cur.close()
+    finally:
+        return_connection(conn)
+
+    if not row:
+        return None
+    return etag_for([group_id, list(row)])
+
+
+def bump_member_groups(cur, user_id):
+    """Change the messages tag of every group user_id is in
+
+    Run on the cursor of the transaction that changes the user's avatar.
+    """
+    if column_exists(cur, "groups", "profiles_version"):
+        cur.execute("""
+            UPDATE groups SET profiles_version = profiles_version + 1
+            WHERE id IN (SELECT group_id FROM group_members WHERE user_id = %s)
+        """, (user_id,))
 
 
 def get_group_messages(group_id, user_id):
@@ -202,8 +240,6 @@ def get_group_messages(group_id, user_id):
         # First verify group exists
         cur.execute("SELECT id FROM groups WHERE id = %s", (group_id,))
         if not cur.fetchone():
-            cur.close()
-            conn.close()
             return None  # Group doesn't exist
         
         # Check if message_color column exists
@@ -251,8 +287,6 @@ def get_group_messages(group_id, user_id):
             """, (group_id,))
 
         rows = cur.fetchall()
-        cur.close()
-        conn.close()
 
         messages = []
         for row in rows:
@@ -277,12 +311,10 @@ def get_group_messages(group_id, user_id):
         return messages
     except Exception as e:
         print(f"[DEBUG group_service] Error getting group messages: {e}")
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
         return None
+    finally:
+        cur.close()
+        return_connection(conn)
 
 
 def send_group_message(group_id, sender_id, content):
@@ -298,8 +330,6 @@ def send_group_message(group_id, sender_id, content):
         """, (group_id, sender_id))
 
         if not cur.fetchone():
-            cur.close()
-            conn.close()
             return None  # User is not a member
 
         # Get user's message color
@@ -355,8 +385,6 @@ def send_group_message(group_id, sender_id, content):
 
         message = cur.fetchone()
         conn.commit()
-        cur.close()
-        conn.close()
 
         message_data = {
             "id": message[0],
@@ -375,12 +403,10 @@ def send_group_message(group_id, sender_id, content):
     except Exception as e:
         print(f"[DEBUG group_service] Error sending group message: {e}")
         conn.rollback()
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
         return None
+    finally:
+        cur.close()
+        return_connection(conn)
 
 
 def get_group_info(group_id, user_id):
@@ -396,8 +422,6 @@ def get_group_info(group_id, user_id):
         """, (group_id, user_id))
 
         if not cur.fetchone():
-            cur.close()
-            conn.close()
             return None
 
         # Get group info
@@ -409,8 +433,6 @@ def get_group_info(group_id, user_id):
 
         group = cur.fetchone()
         if not group:
-            cur.close()
-            conn.close()
             return None
 
         # Get members
@@ -437,9 +459,6 @@ def get_group_info(group_id, user_id):
                 "joined_at": row[4].isoformat() if row[4] else None
             })
 
-        cur.close()
-        conn.close()
-
         return {
             "id": group[0],
             "name": group[1],
@@ -449,12 +468,10 @@ def get_group_info(group_id, user_id):
         }
     except Exception as e:
         print(f"[DEBUG group_service] Error getting group info: {e}")
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
         return None
+    finally:
+        cur.close()
+        return_connection(conn)
 
 
 def add_member_to_group(group_id, user_id, added_by_user_id=None):
@@ -470,8 +487,6 @@ def add_member_to_group(group_id, user_id, added_by_user_id=None):
         """, (group_id, user_id))
 
         if cur.fetchone():
-            cur.close()
-            conn.close()
             return True  # Already a member
 
         # Add member (public groups allow anyone to join)
@@ -481,18 +496,14 @@ def add_member_to_group(group_id, user_id, added_by_user_id=None):
         """, (group_id, user_id))
 
         conn.commit()
-        cur.close()
-        conn.close()
         return True
     except Exception as e:
         print(f"[DEBUG group_service] Error adding member: {e}")
         conn.rollback()
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
         return False
+    finally:
+        cur.close()
+        return_connection(conn)
 
 
 def get_user_joined_groups(user_id):
@@ -587,9 +598,6 @@ def get_user_joined_groups(user_id):
         rows = cur.fetchall()
         print(f"[DEBUG group_service] User {user_id} is a member of {len(rows)} groups")
         
-        cur.close()
-        conn.close()
-
         groups = []
         for row in rows:
             groups.append({
@@ -607,10 +615,8 @@ def get_user_joined_groups(user_id):
         print(f"[DEBUG group_service] Error getting user joined groups: {e}")
         import traceback
         traceback.print_exc()
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
         return []
+    finally:
+        cur.close()
+        return_connection(conn)
 
@@ -0,0 +1,324 @@
+"""
+In-memory points leaderboard.
+
+Every user is one int64 key, -points * 2**32 + user_id, in a sorted array, so
+the array orders users by points (highest first, then lowest id) and a points
+change is one bisect-delete plus one bisect-insert. Current points per user
+live in a second array indexed by user id. About 16 bytes per user.
+
+The board is loaded at startup in a background thread, updated in place when
+this process changes points (gifts, registration), and synced every
+LEADERBOARD_SYNC_SECONDS from points_ledger and new users, which covers
+changes made by other worker processes. Until it is loaded (or with
+LEADERBOARD_ENABLED=0) get_leaderboard reads idx_users_points instead.
+"""
+
+import bisect
+import os
+import threading
+import time
+from array import array
+
+from database import get_connection, return_connection, wait_until_ready, table_exists
+
+LEADERBOARD_ENABLED = os.getenv("LEADERBOARD_ENABLED", "1") == "1"
+LEADERBOARD_SYNC_SECONDS = float(os.getenv("LEADERBOARD_SYNC_SECONDS", "10"))
+LEADERBOARD_MAX_LIMIT = 100  # largest top-K served; changes above it bump the version
+PROFILE_TTL = 60  # seconds the names/avatars of top users are reused
+LOAD_BATCH_SIZE = 50_000
+# Ledger ids are assigned before commit, so a slow transaction can commit an
+# id below one sync() has already passed; a periodic reload picks those up
+REBUILD_SECONDS = 600
+BUILD_RETRY_MAX_DELAY = 60  # seconds between attempts while the first load fails
+
+_SHIFT = 2 ** 32
+
+
+def _key(points, user_id):
+    return -points * _SHIFT + user_id
+
+
+class Leaderboard:
+    """Users ordered by points with O(log n) rank and O(k) top-K"""
+
+    def __init__(self):
+        self.keys = array("q")
+        self.points = array("q")  # by user id, -1 when unknown
+        self.version = 0          # bumped when the top LEADERBOARD_MAX_LIMIT change
+        self.synced_user_id = 0   # highest user id read from the database
+        self.last_ledger_id = 0
+        self.ready = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def load(self, rows, last_ledger_id=0):
+        """Replace the board with (user_id, points) rows"""
+        rows = list(rows)
+        max_user_id = max((user_id for user_id, _ in rows), default=0)
+        points = array("q", [-1]) * (max_user_id + 1)
+        for user_id, user_points in rows:
+            points[user_id] = user_points or 0
+        keys = array("q", sorted(_key(user_points or 0, user_id) for user_id, user_points in rows))
+        with self._lock:
+            self.keys, self.points = keys, points
+            self.synced_user_id = max_user_id
+            self.last_ledger_id = last_ledger_id
+            self.version += 1
+            self.ready = True
+
+    def update(self, user_id, new_points):
+        """Set a user's points, adding the user if needed"""
+        new_points = new_points or 0
+        with self._lock:
+            if user_id >= len(self.points):
+                self.points.extend([-1] * (user_id + 1 - len(self.points)))
+            old_points = self.points[user_id]
+            if old_points == new_points:
+                return
+            top_changed = False
+            if old_points >= 0:
+                index = bisect.bisect_left(self.keys, _key(old_points, user_id))
+                if index < len(self.keys) and self.keys[index] == _key(old_points, user_id):
+                    self.keys.pop(index)
+                    top_changed = index < LEADERBOARD_MAX_LIMIT
+            key = _key(new_points, user_id)
+            index = bisect.bisect_left(self.keys, key)
+            self.keys.insert(index, key)
+            self.points[user_id] = new_points
+            if top_changed or index < LEADERBOARD_MAX_LIMIT:
+                self.version += 1
+
+    def top(self, limit):
+        """[(user_id, points)] of the highest scoring users"""
+        with self._lock:
+            keys = self.keys[:limit]
+        return [(key % _SHIFT, -(key // _SHIFT)) for key in keys]
+
+    def rank(self, user_id):
+        """(rank, points) with ties sharing a rank, or None for unknown users"""
+        with self._lock:
+            if user_id >= len(self.points) or self.points[user_id] < 0:
+                return None
+            user_points = self.points[user_id]
+            # Users with more points all sort before (-points, id 0)
+            above = bisect.bisect_left(self.keys, _key(user_points, 0))
+        return above + 1, user_points
+
+
+LEADERBOARD = Leaderboard()
+_started = False
+_profiles = {"version": None, "expires": 0, "by_id": {}}
+_profiles_lock = threading.Lock()
+
+
+def _load():
+    """(user_id, points) for every user plus the newest ledger id, read in batches"""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        last_ledger_id = 0
+        if table_exists(cur, "points_ledger"):
+            # Read first, so changes during the load are replayed by sync()
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM points_ledger")
+            last_ledger_id = cur.fetchone()[0]
+        rows = []
+        after_id = 0
+        while True:
+            cur.execute(
+                "SELECT id, points FROM users WHERE id > %s ORDER BY id LIMIT %s",
+                (after_id, LOAD_BATCH_SIZE)
+            )
+            batch = cur.fetchall()
+            rows.extend(batch)
+            if len(batch) < LOAD_BATCH_SIZE:
+                break
+            after_id = batch[-1][0]
+        cur.close()
+        return rows, last_ledger_id
+    finally:
+        return_connection(conn)
+
+
+def build():
+    """Load every user's points; False when the load failed"""
+    started = time.perf_counter()
+    try:
+        rows, last_ledger_id = _load()
+    except Exception as e:
+        print(f"[WARNING leaderboard] Could not load points: {e}")
+        return False
+    LEADERBOARD.load(rows, last_ledger_id)
+    print(f"[DEBUG leaderboard] Loaded {len(LEADERBOARD)} users in {time.perf_counter() - started:.2f}s")
+    return True
+
+
+def sync():
+    """Apply ledger entries and new users recorded since the last load or sync"""
+    if not LEADERBOARD.ready:
+        return
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, points FROM users WHERE id > %s ORDER BY id",
+            (LEADERBOARD.synced_user_id,)
+        )
+        changes = cur.fetchall()
+        synced_user_id = max((user_id for user_id, _ in changes), default=LEADERBOARD.synced_user_id)
+        last_ledger_id = LEADERBOARD.last_ledger_id
+        if table_exists(cur, "points_ledger"):
+            cur.execute(
+                "SELECT id, user_id, balance FROM points_ledger WHERE id > %s ORDER BY id",
+                (last_ledger_id,)
+            )
+            for ledger_id, user_id, balance in cur.fetchall():
+                changes.append((user_id, balance))
+                last_ledger_id = ledger_id
+        cur.close()
+    except Exception as e:
+        print(f"[WARNING leaderboard] Sync failed: {e}")
+        return
+    finally:
+        return_connection(conn)
+    for user_id, user_points in changes:
+        LEADERBOARD.update(user_id, user_points)
+    LEADERBOARD.synced_user_id = synced_user_id
+    LEADERBOARD.last_ledger_id = last_ledger_id
+
+
+def _run():
+    wait_until_ready()
+    # Until the first load succeeds get_leaderboard reads the database
+    delay = 1
+    while not build():
+        time.sleep(delay)
+        delay = min(delay * 2, BUILD_RETRY_MAX_DELAY)
+    built = time.monotonic()
+    while True:
+        time.sleep(LEADERBOARD_SYNC_SECONDS)
+        if time.monotonic() - built >= REBUILD_SECONDS:
+            # A failed reload keeps the current board and is retried next time
+            if build():
+                built = time.monotonic()
+        else:
+            sync()
+
+
+def start():
+    """Load the leaderboard in a daemon thread and keep it in sync; safe to call twice"""
+    global _started
+    if _started or not LEADERBOARD_ENABLED:
+        return
+    _started = True
+    threading.Thread(target=_run, name="leaderboard", daemon=True).start()
+
+
+def record_points(user_id, points):
+    """Apply a points change made by this process"""
+    if LEADERBOARD.ready:
+        LEADERBOARD.update(user_id, points)
+
+
+def get_leaderboard(limit, current_user_id=None):
+    """Top users with profile details and the current user's rank
+
+    Served from memory once the board is loaded; before that (or with
+    LEADERBOARD_ENABLED=0) from the idx_users_points index.
+    """
+    limit = max(1, min(int(limit), LEADERBOARD_MAX_LIMIT))
+    if current_user_id is not None:
+        current_user_id = int(current_user_id)
+    if not LEADERBOARD.ready:
+        return _get_leaderboard_from_db(limit, current_user_id)
+
+    entries = LEADERBOARD.top(limit)
+    by_id = _top_profiles([user_id for user_id, _ in entries])
+    mine = LEADERBOARD.rank(current_user_id) if current_user_id is not None else None
+    return _format(entries, by_id, mine, len(LEADERBOARD))
+
+
+def _format(entries, by_id, mine, total_users):
+    top = []
+    rank = 0
+    previous = None
+    for position, (user_id, user_points) in enumerate(entries, start=1):
+        if user_points != previous:
+            rank, previous = position, user_points
+        profile = by_id.get(user_id)
+        if profile is None:
+            continue
+        top.append({"rank": rank, "user_id": user_id, "points": user_points, **profile})
+
+    me = {"rank": mine[0], "points": mine[1]} if mine else None
+    return {"top": top, "me": me, "total_users": total_users}
+
+
+def _profile(row):
+    return {"username": row[0], "display_name": row[1] or row[0], "avatar": row[2]}
+
+
+def _get_leaderboard_from_db(limit, current_user_id):
+    """Same result with the index: a top-K scan plus a count of users above the current one"""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT id, COALESCE(points, 0), username, display_name, avatar_key
+            FROM users
+            ORDER BY points DESC NULLS LAST, id
+            LIMIT %s
+            """,
+            (limit,)
+        )
+        rows = cur.fetchall()
+        mine = None
+        if current_user_id is not None:
+            cur.execute(
+                """
+                SELECT COALESCE(me.points, 0),
+                       (SELECT COUNT(*) FROM users WHERE points > COALESCE(me.points, 0))
+                FROM users me
+                WHERE me.id = %s
+                """,
+                (current_user_id,)
+            )
+            row = cur.fetchone()
+            if row:
+                mine = (row[1] + 1, row[0])
+        cur.close()
+    finally:
+        return_connection(conn)
+
+    entries = [(row[0], row[1]) for row in rows]
+    by_id = {row[0]: _profile(row[2:]) for row in rows}
+    return _format(entries, by_id, mine, None)
+
+
+def _top_profiles(user_ids):
+    """Names and avatars of the top users; re-read only when the top changes or after PROFILE_TTL"""
+    now = time.monotonic()
+    with _profiles_lock:
+        cached = _profiles["by_id"]
+        if (_profiles["version"] == LEADERBOARD.version and _profiles["expires"] > now
+                and all(user_id in cached for user_id in user_ids)):
+            return cached
+
+    version = LEADERBOARD.version
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, username, display_name, avatar_key FROM users WHERE id = ANY(%s)",
+            (user_ids,)
+        )
+        by_id = {row[0]: _profile(row[1:]) for row in cur.fetchall()}
+        cur.close()
+    finally:
+        return_connection(conn)
+
+    with _profiles_lock:
+        _profiles.update(version=version, expires=now + PROFILE_TTL, by_id=by_id)
+    return by_id
@@ -1,111 +1,263 @@
-from database import get_connection
+import base64
+import json
+
+from database import get_connection, return_connection, index_exists, table_exists
+from services.friend_service import invalidate_friends
+from services.username_index import USERNAME_INDEX
+
+SEARCH_MAX_LIMIT = 50
+FUZZY_MIN_LENGTH = 3  # shorter queries match too many trigrams to be useful
+
+_USER_COLUMNS = "u.id, u.username, u.display_name, u.avatar_key, u.points"
+
+
+def search_users_by_username(search_term, current_user_id, limit=20, cursor=None):
+    """Typeahead search by username (not display name); returns (users, next_cursor)
+
+    The first page lists users the current user already has a conversation
+    with, then every other username starting with search_term in
+    alphabetical order (an exact match sorts first), then, if the page is
+    not full, fuzzy trigram matches ranked by similarity. Later pages,
+    requested with next_cursor, continue the alphabetical prefix matches.
+    """
+    term = search_term.strip().lower()
+    limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+    after = decode_search_cursor(cursor) if cursor else None
+    if not term or (cursor and after is None):
+        return [], None
 
-def search_users_by_username(search_term, current_user_id):
-    """Search for users by username (not display name)"""
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        # Search for users with exact username match (case-insensitive)
-        # Exclude the current user and users already in friends list
-        cur.execute("""
-            SELECT 
-                u.id,
-                u.username,
-                u.display_name,
-                u.avatar_key,
-                u.points,
-                CASE 
-                    WHEN EXISTS (
-                        SELECT 1 FROM conversations c 
-                        WHERE (c.user1_id = %s AND c.user2_id = u.id) 
-                        OR (c.user2_id = %s AND c.user1_id = u.id)
-                    ) THEN TRUE 
-                    ELSE FALSE 
-                END AS has_conversation
-            FROM users u
-            WHERE LOWER(u.username) = LOWER(%s)
-            AND u.id != %s
-            ORDER BY u.username ASC
-            LIMIT 20
-        """, (current_user_id, current_user_id, search_term, current_user_id))
-
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        params = {
+            "me": current_user_id,
+            "term": term,
+            "prefix": _escape_like(term) + "%",
+            "limit": limit,
+        }
+        if table_exists(cur, "friendships"):
+            partners = "SELECT friend_id FROM friendships WHERE user_id = %(me)s AND conversation_id IS NOT NULL"
+        else:
+            partners = """
+                SELECT CASE WHEN user1_id = %(me)s THEN user2_id ELSE user1_id END
+                FROM conversations WHERE user1_id = %(me)s OR user2_id = %(me)s
+            """
 
         users = []
-        for row in rows:
-            users.append({
-                "user_id": row[0],
-                "username": row[1],
-                "display_name": row[2] or row[1],
-                "avatar": row[3],
-                "points": row[4] or 0,
-                "has_conversation": row[5]
-            })
-
-        return users
+        first_page = after is None
+        if first_page or USERNAME_INDEX.ready:
+            # Conversation partners matching the prefix: a handful of rows per
+            # user. Shown first on the first page; the in-memory index also
+            # needs them on later pages to leave them out
+            cur.execute(f"""
+                SELECT {_USER_COLUMNS}, TRUE
+                FROM users u
+                WHERE u.id IN ({partners})
+                AND LOWER(u.username) COLLATE "C" LIKE %(prefix)s
+                ORDER BY LOWER(u.username) COLLATE "C", u.id
+            """, params)
+            partner_rows = cur.fetchall()
+            if first_page:
+                users.extend(partner_rows[:limit])
+                after = ("", 0)
+
+        page = limit - len(users) + 1
+        if USERNAME_INDEX.ready:
+            # Everyone else from the in-memory index, then their rows by id
+            exclude = {current_user_id, *(row[0] for row in partner_rows)}
+            ids = [user_id for _, user_id in USERNAME_INDEX.search(term, page, after=after, exclude=exclude)]
+            cur.execute(f"SELECT {_USER_COLUMNS}, FALSE FROM users u WHERE u.id = ANY(%s)", (ids,))
+            by_id = {row[0]: row for row in cur.fetchall()}
+            rows = [by_id[user_id] for user_id in ids if user_id in by_id]
+        else:
+            # Everyone else, walking idx_users_username_prefix from the cursor on
+            params.update(after_name=after[0], after_id=after[1], page=page)
+            cur.execute(f"""
+                SELECT {_USER_COLUMNS}, FALSE
+                FROM users u
+                WHERE LOWER(u.username) COLLATE "C" LIKE %(prefix)s
+                AND (LOWER(u.username) COLLATE "C", u.id) > (%(after_name)s, %(after_id)s)
+                AND u.id != %(me)s
+                AND u.id NOT IN ({partners})
+                ORDER BY LOWER(u.username) COLLATE "C", u.id
+                LIMIT %(page)s
+            """, params)
+            rows = cur.fetchall()
+
+        next_cursor = None
+        if len(users) + len(rows) > limit:
+            rows = rows[:limit - len(users)]
+            last = rows[-1] if rows else None
+            next_cursor = encode_search_cursor(last[1].lower(), last[0]) if last else encode_search_cursor("", 0)
+        users.extend(rows)
+
+        # Fill a short first page with fuzzy matches (needs the pg_trgm index)
+        if (first_page and len(users) < limit and len(term) >= FUZZY_MIN_LENGTH
+                and index_exists(cur, "idx_users_username_trgm")):
+            params["fuzzy_limit"] = limit - len(users)
+            cur.execute(f"""
+                SELECT {_USER_COLUMNS}, u.id IN ({partners}) AS has_conversation
+                FROM users u
+                WHERE LOWER(u.username) %% %(term)s
+                AND LOWER(u.username) COLLATE "C" NOT LIKE %(prefix)s
+                AND u.id != %(me)s
+                ORDER BY has_conversation DESC, similarity(LOWER(u.username), %(term)s) DESC, u.username
+                LIMIT %(fuzzy_limit)s
+            """, params)
+            users.extend(cur.fetchall())
     except Exception as e:
         print(f"[DEBUG user_search_service] Error searching users: {e}")
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
+        return [], None
+    finally:
+        cur.close()
+        return_connection(conn)
+
+    results = []
+    for row in users:
+        results.append({
+            "user_id": row[0],
+            "username": row[1],
+            "display_name": row[2] or row[1],
+            "avatar": row[3],
+            "points": row[4] or 0,
+            "has_conversation": row[5]
+        })
+
+    return results, next_cursor
+
+
+def suggest_usernames(search_term, current_user_id, limit=10):
+    """Prefix suggestions [{user_id, username}] from the in-memory index, without a query"""
+    term = search_term.strip().lower()
+    limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+    if not term:
         return []
+    if USERNAME_INDEX.ready:
+        matches = USERNAME_INDEX.search(term, limit, exclude={current_user_id})
+        return [{"user_id": user_id, "username": name} for name, user_id in matches]
+    # Index still loading (or over its memory budget)
+    users, _ = search_users_by_username(term, current_user_id, limit=limit)
+    return [{"user_id": u["user_id"], "username": u["username"]} for u in users]
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def encode_search_cursor(username, user_id):
+    payload = json.dumps([username, user_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor):
+    """(lowercase username, user id) from encode_search_cursor, or None if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        username, user_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(username), int(user_id)
+    except (ValueError, TypeError):
+        return None
 
 
 def get_or_create_conversation(user1_id, user2_id):
-    """Get existing conversation or create a new one"""
+    """Get existing conversation or create a new one; returns (success, conversation_id or error)"""
+    if user1_id == user2_id:
+        return False, "Cannot start a conversation with yourself"
+
     conn = get_connection()
     cur = conn.cursor()
 
     try:
-        print(f"[DEBUG user_search_service] get_or_create_conversation called: user1_id={user1_id}, user2_id={user2_id}")
-        
-        # Check if conversation already exists
-        cur.execute("""
-            SELECT id FROM conversations 
-            WHERE (user1_id = %s AND user2_id = %s) 
-            OR (user2_id = %s AND user1_id = %s)
-            LIMIT 1
-        """, (user1_id, user2_id, user1_id, user2_id))
-
-        row = cur.fetchone()
-        
-        if row:
-            # Conversation exists
-            conversation_id = row[0]
-            print(f"[DEBUG user_search_service] Found existing conversation: {conversation_id}")
-            cur.close()
-            conn.close()
-            return conversation_id
-        
-        # Create new conversation
-        print(f"[DEBUG user_search_service] Creating new conversation between {user1_id} and {user2_id}")
-        cur.execute("""
-            INSERT INTO conversations (user1_id, user2_id)
-            VALUES (%s, %s)
-            RETURNING id
-        """, (user1_id, user2_id))
-        
-        conversation_id = cur.fetchone()[0]
+        if index_exists(cur, "idx_conversations_user_pair"):
+            # One statement: validates the other user, inserts unless the pair
+            # already has a conversation (in either order), and returns the id
+            conversation_id, created = _upsert_conversation(cur, user1_id, user2_id)
+            if conversation_id is None:
+                # A conversation committed by a concurrent request after this
+                # statement's snapshot is invisible to it; a retry sees it
+                conversation_id, created = _upsert_conversation(cur, user1_id, user2_id)
+        else:
+            # Before add_conversation_pair_unique_index.sql is applied
+            conversation_id, created = _select_then_insert_conversation(cur, user1_id, user2_id)
+
+        if conversation_id is None:
+            conn.rollback()
+            return False, "User not found"
+
+        if created:
+            # Record the friendship in both directions in the same transaction
+            if table_exists(cur, "friendships"):
+                cur.execute("""
+                    INSERT INTO friendships (user_id, friend_id, conversation_id)
+                    VALUES (%s, %s, %s), (%s, %s, %s)
+                    ON CONFLICT (user_id, friend_id) DO UPDATE
+                    SET conversation_id = EXCLUDED.conversation_id
+                    WHERE friendships.conversation_id IS NULL
+                """, (user1_id, user2_id, conversation_id, user2_id, user1_id, conversation_id))
+            print(f"[DEBUG user_search_service] Created new conversation {conversation_id} between {user1_id} and {user2_id}")
+
         conn.commit()
-        print(f"[DEBUG user_search_service] Created new conversation: {conversation_id}")
-        cur.close()
-        conn.close()
-        
-        return conversation_id
     except Exception as e:
         print(f"[DEBUG user_search_service] Error getting/creating conversation: {e}")
         import traceback
         traceback.print_exc()
         conn.rollback()
-        try:
-            cur.close()
-            conn.close()
-        except:
-            pass
-        return None
+        return False, "Failed to create conversation"
+    finally:
+        cur.close()
+        return_connection(conn)
+
+    if created:
+        invalidate_friends(user1_id, user2_id)
+    return True, conversation_id
+
+
+def _upsert_conversation(cur, user1_id, user2_id):
+    """(conversation_id, created), or (None, False) when user2 does not exist"""
+    cur.execute("""
+        WITH other_user AS (
+            SELECT id FROM users WHERE id = %(other)s
+        ),
+        inserted AS (
+            INSERT INTO conversations (user1_id, user2_id)
+            SELECT %(me)s, id FROM other_user
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        )
+        SELECT id, TRUE FROM inserted
+        UNION ALL
+        SELECT c.id, FALSE
+        FROM conversations c
+        JOIN other_user o ON TRUE
+        WHERE LEAST(c.user1_id, c.user2_id) = LEAST(%(me)s, o.id)
+        AND GREATEST(c.user1_id, c.user2_id) = GREATEST(%(me)s, o.id)
+        LIMIT 1
+    """, {"me": user1_id, "other": user2_id})
+    row = cur.fetchone()
+    return (row[0], row[1]) if row else (None, False)
+
+
+def _select_then_insert_conversation(cur, user1_id, user2_id):
+    """Legacy path without the pair index; same return value as _upsert_conversation"""
+    cur.execute("SELECT id FROM users WHERE id = %s", (user2_id,))
+    if not cur.fetchone():
+        return None, False
+
+    # Check if conversation already exists
+    cur.execute("""
+        SELECT id FROM conversations 
+        WHERE (user1_id = %s AND user2_id = %s) 
+        OR (user2_id = %s AND user1_id = %s)
+        LIMIT 1
+    """, (user1_id, user2_id, user1_id, user2_id))
+    row = cur.fetchone()
+    if row:
+        return row[0], False
 
+    cur.execute("""
+        INSERT INTO conversations (user1_id, user2_id)
+        VALUES (%s, %s)
+        RETURNING id
+    """, (user1_id, user2_id))
+    return cur.fetchone()[0], True
@@ -0,0 +1,210 @@
+"""
+In-process prefix index of usernames for typeahead search.
+
+Lowercase usernames are kept in one sorted list with the matching user ids in
+a parallel array, so a prefix lookup is a bisect plus a short walk. The index
+is loaded from users in a background thread at startup, extended by
+register_user, and topped up every USERNAME_INDEX_SYNC_SECONDS with users
+created by other worker processes (ids above the highest one loaded).
+
+Each entry costs roughly the size of the lowercase string object plus 12
+bytes. If loading would exceed USERNAME_INDEX_MAX_MB the index stays
+disabled and search falls back to the database.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from array import array
+
+from database import get_connection, return_connection, wait_until_ready
+
+USERNAME_INDEX_ENABLED = os.getenv("USERNAME_INDEX_ENABLED", "1") == "1"
+USERNAME_INDEX_MAX_MB = float(os.getenv("USERNAME_INDEX_MAX_MB", "128"))
+USERNAME_INDEX_SYNC_SECONDS = float(os.getenv("USERNAME_INDEX_SYNC_SECONDS", "30"))
+LOAD_BATCH_SIZE = 50_000
+BUILD_RETRY_MAX_DELAY = 60  # seconds between attempts while the first load fails
+
+
+class UsernameIndex:
+    """Sorted (lowercase username, user id) pairs with prefix search"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.names = []
+        self.ids = array("q")
+        self.synced_id = 0  # highest user id read from the database
+        self.bytes = 0
+        self.ready = False
+        self.over_budget = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _entry_bytes(self, name):
+        # list slot (8) + array slot (8) + the string object itself
+        return 16 + sys.getsizeof(name)
+
+    def load(self, pairs):
+        """Replace the contents with (username, user_id) pairs; False when over budget"""
+        entries = []
+        total = 0
+        max_id = 0
+        for username, user_id in pairs:
+            name = username.lower()
+            total += self._entry_bytes(name)
+            if total > self.max_bytes:
+                with self._lock:
+                    self.over_budget = True
+                    self.ready = False
+                return False
+            entries.append((name, user_id))
+            max_id = max(max_id, user_id)
+        entries.sort()
+        with self._lock:
+            self.names = [name for name, _ in entries]
+            self.ids = array("q", (user_id for _, user_id in entries))
+            self.bytes = total
+            self.synced_id = max_id
+            self.over_budget = False
+            self.ready = True
+        return True
+
+    def add(self, username, user_id):
+        """Insert one user (no-op if already present); False once over budget"""
+        name = username.lower()
+        with self._lock:
+            if self.over_budget:
+                return False
+            size = self._entry_bytes(name)
+            if self.bytes + size > self.max_bytes:
+                print(f"[WARNING username_index] Memory budget of {self.max_bytes} bytes reached, disabling")
+                self.over_budget = True
+                self.ready = False
+                self.names, self.ids = [], array("q")
+                return False
+            index = bisect.bisect_left(self.names, name)
+            while index < len(self.names) and self.names[index] == name:
+                if self.ids[index] == user_id:
+                    return True
+                if self.ids[index] > user_id:
+                    break
+                index += 1
+            self.names.insert(index, name)
+            self.ids.insert(index, user_id)
+            self.bytes += size
+            return True
+
+    def search(self, prefix, limit, after=None, exclude=()):
+        """Up to limit (username, user_id) pairs starting with prefix, in (username, id) order
+
+        after is a (lowercase username, user id) position to resume from, as
+        used by the search cursor; ids in exclude are skipped.
+        """
+        prefix = prefix.lower()
+        with self._lock:
+            names, ids = self.names, self.ids
+            if after is not None and after[0] >= prefix:
+                index = bisect.bisect_left(names, after[0])
+                while index < len(names) and names[index] == after[0] and ids[index] <= after[1]:
+                    index += 1
+            else:
+                index = bisect.bisect_left(names, prefix)
+            matches = []
+            while index < len(names) and len(matches) < limit:
+                name = names[index]
+                if not name.startswith(prefix):
+                    break
+                if ids[index] not in exclude:
+                    matches.append((name, ids[index]))
+                index += 1
+            return matches
+
+
+USERNAME_INDEX = UsernameIndex(int(USERNAME_INDEX_MAX_MB * 1024 * 1024))
+_started = False
+
+
+def _fetch_users(after_id):
+    """(username, id) pairs for users with id > after_id, read in batches"""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        pairs = []
+        while True:
+            cur.execute(
+                "SELECT username, id FROM users WHERE id > %s ORDER BY id LIMIT %s",
+                (after_id, LOAD_BATCH_SIZE)
+            )
+            rows = cur.fetchall()
+            pairs.extend(rows)
+            if len(rows) < LOAD_BATCH_SIZE:
+                break
+            after_id = rows[-1][1]
+        cur.close()
+        return pairs
+    finally:
+        return_connection(conn)
+
+
+def build():
+    """Load every username; False when the load failed (not when over budget)"""
+    started = time.perf_counter()
+    try:
+        pairs = _fetch_users(0)
+    except Exception as e:
+        print(f"[WARNING username_index] Could not load usernames: {e}")
+        return False
+    if USERNAME_INDEX.load(pairs):
+        print(f"[DEBUG username_index] Indexed {len(USERNAME_INDEX)} usernames "
+              f"({USERNAME_INDEX.bytes / 1024 / 1024:.1f} MB) in {time.perf_counter() - started:.2f}s")
+    else:
+        print(f"[WARNING username_index] {len(pairs)} usernames exceed USERNAME_INDEX_MAX_MB="
+              f"{USERNAME_INDEX_MAX_MB}; search uses the database")
+    return True
+
+
+def sync():
+    """Add users created since the last load or sync (e.g. by other workers)"""
+    if not USERNAME_INDEX.ready:
+        return
+    try:
+        pairs = _fetch_users(USERNAME_INDEX.synced_id)
+    except Exception as e:
+        print(f"[WARNING username_index] Sync failed: {e}")
+        return
+    # Users registered by this process are already indexed; add() skips them
+    for username, user_id in pairs:
+        USERNAME_INDEX.add(username, user_id)
+        USERNAME_INDEX.synced_id = max(USERNAME_INDEX.synced_id, user_id)
+
+
+def _run():
+    wait_until_ready()
+    # Until the first load succeeds search reads the database
+    delay = 1
+    while not build():
+        time.sleep(delay)
+        delay = min(delay * 2, BUILD_RETRY_MAX_DELAY)
+    # sync() does nothing while the index is over budget
+    while True:
+        time.sleep(USERNAME_INDEX_SYNC_SECONDS)
+        sync()
+
+
+def start():
+    """Build the index in a daemon thread and keep it in sync; safe to call twice"""
+    global _started
+    if _started or not USERNAME_INDEX_ENABLED:
+        return
+    _started = True
+    threading.Thread(target=_run, name="username-index", daemon=True).start()
+
+
+def add_user(username, user_id):
+    """Index a newly registered user"""
+    if USERNAME_INDEX.ready:
+        USERNAME_INDEX.add(username, user_id)
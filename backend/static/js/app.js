@@ -2,7 +2,7 @@
 console.log("APP.JS DEFINITELY LOADED");
 
 import {state} from "./state.js"
-import {fetchMe, getMessageColor} from "./modules/api.js"
+import {fetchBootstrap, fetchMe, getMessageColor} from "./modules/api.js"
 import { initNavigation, showTab } from "./modules/navigation.js"
 import { dom } from "./utils/dom.js"
 
@@ -75,6 +75,9 @@ async function initUser(){
   }
 }
 
+// Start loading the first screen's data before the DOM is ready
+fetchBootstrap()
+
 // Initialize after DOM is ready
 if (document.readyState === 'loading') {
   document.addEventListener('DOMContentLoaded', () => {
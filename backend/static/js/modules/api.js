@@ -1,14 +1,44 @@
+// /bootstrap returns the first screen's data (/me, /message-color,
+// /conversations, /friends, /groups) in one request. Each part is handed out once, and only shortly
+// after page load; later loads use the regular endpoints
+const BOOTSTRAP_MAX_AGE_MS = 30000
+let bootstrapPromise = null
+let bootstrapStartedAt = 0
+const bootstrapTaken = new Set()
+
+export function fetchBootstrap() {
+  if (!bootstrapPromise) {
+    bootstrapStartedAt = Date.now()
+    bootstrapPromise = fetch("/bootstrap", { credentials: "include" })
+      .then(res => res.ok ? res.json() : null)
+      .catch(() => null)
+  }
+  return bootstrapPromise
+}
+
+export async function takeBootstrap(key) {
+  if (!bootstrapPromise || bootstrapTaken.has(key)) return null
+  if (Date.now() - bootstrapStartedAt > BOOTSTRAP_MAX_AGE_MS) return null
+  bootstrapTaken.add(key)
+  const data = await bootstrapPromise
+  return data ? data[key] : null
+}
+
 export async function fetchMe() {
+  const bootstrapped = await takeBootstrap("me")
+  if (bootstrapped) return bootstrapped
   const res = await fetch("/me", { credentials: "include" })
   return res.json()
 }
 
 export async function fetchConversations() {
-  // Add cache-busting timestamp to ensure fresh data
-  const timestamp = new Date().getTime()
-  const res = await fetch(`/conversations?t=${timestamp}`, { 
+  const bootstrapped = await takeBootstrap("conversations")
+  if (bootstrapped) return bootstrapped
+  // Always revalidate: the server answers 304 via ETag when nothing changed
+  // and the browser hands back its cached copy
+  const res = await fetch("/conversations", {
     credentials: "include",
-    cache: "no-store"
+    cache: "no-cache"
   })
   return res.json()
 }
@@ -69,6 +99,8 @@ export async function unlikeGroup(groupId) {
 }
 
 export async function getMessageColor() {
+  const bootstrapped = await takeBootstrap("message_color")
+  if (bootstrapped) return { color: bootstrapped }
   const res = await fetch("/message-color", { credentials: "include" })
   return res.json()
 }
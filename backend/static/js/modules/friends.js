@@ -1,6 +1,7 @@
 import { state } from "../state.js"
 import { dom } from "../utils/dom.js"
 import { renderChatView } from "./chats.js"
+import { takeBootstrap } from "./api.js"
 
 export async function renderFriends() {
   // Remove create group button from friends page
@@ -31,15 +32,18 @@ export async function renderFriends() {
   `
   
   try {
-    // Fetch friends list
-    const response = await fetch("/friends", { credentials: "include" })
-    
-    if (!response.ok) {
-      throw new Error("Failed to fetch friends")
+    // Fetch friends list (from /bootstrap on the first load)
+    let friends = await takeBootstrap("friends")
+    if (!friends) {
+      const response = await fetch("/friends", { credentials: "include" })
+      
+      if (!response.ok) {
+        throw new Error("Failed to fetch friends")
+      }
+      
+      friends = await response.json()
     }
     
-    const friends = await response.json()
-    
     console.log("[DEBUG friends] Received friends:", friends)
     console.log("[DEBUG friends] Friends count:", friends.length)
     
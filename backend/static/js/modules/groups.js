@@ -1,6 +1,7 @@
 import { state } from "../state.js"
 import { dom } from "../utils/dom.js"
 import { renderGroupChatView } from "./groupChat.js"
+import { takeBootstrap } from "./api.js"
 
 export async function renderGroups() {
   try {
@@ -48,15 +49,18 @@ export async function renderGroups() {
       card.classList.remove("chat-active")
     }
     
-    // Fetch groups list
-    const response = await fetch("/groups", { credentials: "include" })
-    
-    if (!response.ok) {
-      throw new Error("Failed to fetch groups")
+    // Fetch groups list (from /bootstrap on the first load)
+    let groups = await takeBootstrap("groups")
+    if (!groups) {
+      const response = await fetch("/groups", { credentials: "include" })
+      
+      if (!response.ok) {
+        throw new Error("Failed to fetch groups")
+      }
+      
+      groups = await response.json()
     }
     
-    const groups = await response.json()
-    
     console.log("[DEBUG groups] Received groups:", groups)
     
     dom.content().className = "app-content groups-content"
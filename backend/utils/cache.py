@@ -0,0 +1,241 @@
+"""
+Small in-process caches for per-user read paths.
+
+A VersionedCache keeps one entry per key stamped with the key's version.
+Writers call bump(key) after changing the underlying rows, which makes the
+entry stale without touching it; readers take version(key) before computing
+a value and hand it back to set(), so a value computed while a bump happened
+is never stored. Entries also expire after ttl seconds, which bounds staleness
+for changes that do not bump (another user's avatar or points).
+
+Every process keeps its own cache. A cache given a SharedVersions also stamps
+entries with a version that bumps write to the database. Each process keeps a
+copy of those versions, refreshed every CACHE_VERSION_SYNC_SECONDS by a
+background thread, so a bump in one worker process makes the entry stale in
+all of them within that interval while reads never touch the database.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+
+from database import get_connection, return_connection, table_exists, wait_until_ready
+from utils.metrics import record_cache
+
+CACHE_VERSION_SYNC_SECONDS = float(os.getenv("CACHE_VERSION_SYNC_SECONDS", "1"))
+# changed_at is taken before the bump commits, so each sync re-reads this far
+# back to pick up rows that committed late; applying a version twice is harmless
+CACHE_VERSION_OVERLAP_SECONDS = 5
+_OVERLAP = timedelta(seconds=CACHE_VERSION_OVERLAP_SECONDS)
+
+_shared_versions = {}  # cache name -> SharedVersions
+_sync_since = None  # database time the next sync reads changes from
+_started = False
+
+
+def etag_for(value):
+    """Stable ETag for a JSON-serializable value"""
+    payload = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha1(payload).hexdigest()
+
+
+class SharedVersions:
+    """Per-key versions in the cache_versions table, shared by every worker
+
+    bump() is one upsert. get() reads this process's copy of the versions,
+    which sync_shared_versions() refreshes from the table, and never queries.
+    Before create_cache_versions_table.sql is applied every version stays 0,
+    so caches fall back to per-process versions and their TTL.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._versions = {}  # key -> version, only for keys bumped since start-up
+        self._lock = threading.Lock()
+        _shared_versions[name] = self
+
+    def get(self, key):
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def apply(self, key, version):
+        """Record a version read from the table; older ones are ignored"""
+        with self._lock:
+            if version > self._versions.get(key, 0):
+                self._versions[key] = version
+
+    def bump(self, key):
+        """Invalidate key in every process; call after the change is committed"""
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            if table_exists(cur, "cache_versions"):
+                cur.execute("""
+                    INSERT INTO cache_versions (cache, cache_key, version, changed_at)
+                    VALUES (%s, %s, 1, clock_timestamp())
+                    ON CONFLICT (cache, cache_key) DO UPDATE
+                    SET version = cache_versions.version + 1, changed_at = clock_timestamp()
+                    RETURNING version
+                """, (self.name, key))
+                version = cur.fetchone()[0]
+                conn.commit()
+                self.apply(key, version)
+            cur.close()
+        except Exception as e:
+            print(f"[WARNING cache] Could not bump shared version of {self.name} {key}: {e}")
+            conn.rollback()
+        finally:
+            return_connection(conn)
+
+
+def sync_shared_versions():
+    """Apply the cache_versions rows changed since the last sync"""
+    global _sync_since
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        if not table_exists(cur, "cache_versions"):
+            cur.close()
+            return
+        cur.execute("SELECT now()")
+        now = cur.fetchone()[0]
+        # The first sync only needs bumps made while this process started
+        since = _sync_since if _sync_since is not None else now
+        cur.execute(
+            "SELECT cache, cache_key, version FROM cache_versions WHERE changed_at > %s",
+            (since - _OVERLAP,)
+        )
+        rows = cur.fetchall()
+        cur.close()
+    except Exception as e:
+        print(f"[WARNING cache] Could not sync shared versions: {e}")
+        return
+    finally:
+        return_connection(conn)
+    for name, key, version in rows:
+        shared = _shared_versions.get(name)
+        if shared is not None:
+            shared.apply(key, version)
+    _sync_since = now
+
+
+def _run():
+    wait_until_ready()
+    while True:
+        sync_shared_versions()
+        time.sleep(CACHE_VERSION_SYNC_SECONDS)
+
+
+def start():
+    """Keep shared versions in sync in a daemon thread; safe to call twice"""
+    global _started
+    if _started:
+        return
+    _started = True
+    threading.Thread(target=_run, name="cache-versions", daemon=True).start()
+
+
+class VersionedCache:
+    """Per-key cached values invalidated by version bumps and a TTL
+
+    With shared (a SharedVersions), version() is a (local, shared) pair; both
+    are in memory. get_many(), versions() and set_many() use local versions
+    only, so they are for caches without one.
+    """
+
+    def __init__(self, name, ttl, max_entries=10000, shared=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = {}   # key -> (version, expires_at, value)
+        self._versions = {}  # key -> version, only for keys that were bumped
+        self._lock = threading.Lock()
+
+    def version(self, key):
+        with self._lock:
+            local = self._versions.get(key, 0)
+        if self.shared is None:
+            return local
+        return (local, self.shared.get(key))
+
+    def _local(self, version):
+        return version[0] if self.shared is not None else version
+
+    def bump(self, key):
+        """Invalidate key; call after committing a change that affects it"""
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.bump(key)
+
+    def get(self, key):
+        """Cached value for key, or None when missing, bumped or expired"""
+        now = time.monotonic()
+        current = self.version(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            fresh = (
+                entry is not None
+                and entry[0] == current
+                and entry[1] > now
+            )
+            if entry is not None and not fresh:
+                del self._entries[key]
+        record_cache(self.name, fresh)
+        return entry[2] if fresh else None
+
+    def set(self, key, value, version):
+        """Store value computed at version; dropped if key was bumped since"""
+        with self._lock:
+            if self._versions.get(key, 0) != self._local(version):
+                return
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                # Evict the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+
+    def versions(self, keys):
+        """{key: version} for several keys, to hand to set_many()"""
+        with self._lock:
+            return {key: self._versions.get(key, 0) for key in keys}
+
+    def get_many(self, keys):
+        """{key: value} for the keys with a fresh entry, under one lock"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] == self._versions.get(key, 0) and entry[1] > now:
+                    found[key] = entry[2]
+                else:
+                    del self._entries[key]
+        for key in keys:
+            record_cache(self.name, key in found)
+        return found
+
+    def set_many(self, values, versions):
+        """Store {key: value} computed at versions ({key: version}); bumped keys are dropped"""
+        with self._lock:
+            values = {k: v for k, v in values.items() if self._versions.get(k, 0) == versions.get(k)}
+            overflow = len(self._entries) + len(values) - self.max_entries
+            if overflow > 0:
+                # Evict the entries closest to expiry in one pass
+                for key in heapq.nsmallest(overflow, self._entries, key=lambda k: self._entries[k][1]):
+                    del self._entries[key]
+            expires = time.monotonic() + self.ttl
+            for key, value in values.items():
+                self._entries[key] = (versions[key], expires, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
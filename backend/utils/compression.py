@@ -0,0 +1,181 @@
+"""
+Response compression.
+
+Dynamic responses (JSON, HTML, plain text) of at least COMPRESS_MIN_BYTES
+are compressed with the best encoding the client accepts: brotli when the
+optional Brotli package is installed, otherwise gzip. Streamed responses are
+compressed chunk by chunk, flushing after each one so the client still sees
+every chunk as soon as it is sent.
+
+Static files are not compressed per request. compress_static.py writes .gz
+(and .br) copies next to them at build time, and the static route serves
+those with Content-Encoding when the client accepts it and the copy is not
+older than the file.
+"""
+
+import gzip
+import mimetypes
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+    "text/css",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+}
+
+# Pre-compressed file suffix per encoding, in order of preference
+STATIC_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def supported_encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encodings, encodings=None):
+    """The encoding from encodings the client ranks highest, or None for identity"""
+    best, best_quality = None, 0
+    for encoding in encodings or supported_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks, encoding):
+    """Compress an iterable of chunks, flushing after each so none is held back"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        # wbits 31 writes a gzip header and trailer
+        compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def _add_vary(response):
+    response.vary.add("Accept-Encoding")
+
+
+def _weaken_etag(response):
+    # The bytes differ per encoding, so a strong tag would claim the
+    # representations are identical; If-None-Match compares weakly anyway
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def _not_modified(response, accept_encodings):
+    """Give a 304 the Vary and ETag its full response would have carried
+
+    The 304 has no body or real mimetype to go by. Static files set their
+    own headers (direct_passthrough); every other tagged route sends JSON.
+    """
+    if (response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or not response.get_etag()[0]):
+        return response
+    _add_vary(response)
+    if choose_encoding(accept_encodings) is not None:
+        _weaken_etag(response)
+    return response
+
+
+def compress_response(response, accept_encodings):
+    """Compress response in place when it is worth it; returns response"""
+    if response.status_code == 304:
+        return _not_modified(response, accept_encodings)
+    if (response.status_code < 200 or response.status_code in (204, 206)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    _add_vary(response)
+
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    # Weak whenever an encoding was negotiated, compressed or not, so the
+    # tag matches the one a 304 for the same request carries
+    _weaken_etag(response)
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def send_static_file(static_folder, filename, accept_encodings):
+    """Serve filename, or its pre-compressed copy when accepted and up to date"""
+    from flask import send_from_directory
+    from werkzeug.security import safe_join
+
+    path = safe_join(static_folder, filename)
+    encoding = None
+    if path is not None and os.path.isfile(path):
+        available = [
+            name for name, suffix in STATIC_SUFFIXES.items()
+            if os.path.isfile(path + suffix) and os.path.getmtime(path + suffix) >= os.path.getmtime(path)
+        ]
+        encoding = choose_encoding(accept_encodings, available) if available else None
+
+    if encoding is None:
+        response = send_from_directory(static_folder, filename)
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = send_from_directory(static_folder, filename + STATIC_SUFFIXES[encoding], mimetype=mimetype)
+        response.headers["Content-Encoding"] = encoding
+    if response.mimetype in COMPRESSIBLE_MIMETYPES:
+        _add_vary(response)
+    return response
+
+
+def init_app(app):
+    """Compress dynamic responses and serve pre-compressed static files for app"""
+    from flask import request
+
+    if not COMPRESS_ENABLED:
+        return
+
+    @app.after_request
+    def compress_dynamic_response(response):
+        return compress_response(response, request.accept_encodings)
+
+    def static(filename):
+        return send_static_file(app.static_folder, filename, request.accept_encodings)
+
+    app.view_functions["static"] = static
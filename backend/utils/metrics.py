@@ -0,0 +1,208 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms are plain dicts keyed by label values behind a lock,
+so recording costs a dict lookup and an add. Gauges are read from a callback
+when /metrics is scraped. Each worker process keeps its own numbers.
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Histogram with fixed upper bounds; bucket counts are made cumulative on render"""
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, ([*entry[0]], entry[1], entry[2])) for key, entry in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge read from callback() at scrape time; callback returns a number or {label value: number}"""
+    def __init__(self, name, help_text, callback, labelname=None):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.labelname = labelname
+        _registry.append(self)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"[WARNING metrics] Gauge {self.name} failed: {e}")
+            return lines
+        if isinstance(value, dict):
+            for label, number in sorted(value.items()):
+                lines.append(f"{self.name}{_format_labels((self.labelname,), (label,))} {_format_number(number)}")
+        elif value is not None:
+            lines.append(f"{self.name} {_format_number(value)}")
+        return lines
+
+
+def render():
+    """All registered metrics in the text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+def _pool_gauge(field):
+    def read():
+        from database import pool_stats
+        return pool_stats().get(field)
+    return read
+
+
+HTTP_REQUESTS = Counter(
+    "hush_http_requests_total", "HTTP requests by blueprint, route, method and status",
+    ("blueprint", "route", "method", "status")
+)
+HTTP_LATENCY = Histogram(
+    "hush_http_request_duration_seconds", "HTTP request latency by blueprint and route",
+    ("blueprint", "route", "method")
+)
+DB_POOL_WAIT = Histogram(
+    "hush_db_pool_acquire_seconds", "Time spent getting a connection in get_connection",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+DB_POOL_FALLBACKS = Counter(
+    "hush_db_pool_fallbacks_total", "Direct connections opened because the pool was unavailable or exhausted"
+)
+CACHE_REQUESTS = Counter(
+    "hush_cache_requests_total", "Cache lookups by cache and result (hit or miss)", ("cache", "result")
+)
+BCRYPT_SECONDS = Histogram(
+    "hush_bcrypt_seconds", "Time spent in bcrypt by operation (hash, check or rehash)", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0)
+)
+BCRYPT_QUEUE_SECONDS = Histogram(
+    "hush_bcrypt_queue_seconds", "Time bcrypt jobs waited for a pool thread", ("operation",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+BCRYPT_REJECTED = Counter(
+    "hush_bcrypt_rejected_total", "bcrypt jobs refused because the pool queue was full", ("operation",)
+)
+RATE_LIMITED = Counter(
+    "hush_rate_limited_total", "Requests rejected by a rate limiter", ("limiter",)
+)
+Gauge("hush_db_pool_connections_in_use", "Pool connections checked out", _pool_gauge("in_use"))
+Gauge("hush_db_pool_connections_idle", "Pool connections idle in the pool", _pool_gauge("idle"))
+Gauge("hush_db_pool_connections_max", "Pool size limit (maxconn)", _pool_gauge("max"))
+Gauge("hush_db_pool_waiters", "Threads currently waiting in get_connection", _pool_gauge("waiters"))
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def init_app(app):
+    """Record request counts and latency for every request handled by app"""
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        blueprint = request.blueprint or "app"
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_LATENCY.observe(time.perf_counter() - started, blueprint=blueprint, route=route, method=request.method)
+        HTTP_REQUESTS.inc(blueprint=blueprint, route=route, method=request.method, status=str(response.status_code))
+        return response
@@ -0,0 +1,115 @@
+"""
+bcrypt hashing on a dedicated, bounded thread pool.
+
+bcrypt releases the GIL while it works, so a few threads give real
+parallelism; keeping them in their own pool caps how many CPU cores logins
+and registrations can take from chat traffic. At most BCRYPT_WORKERS hashes
+run at once and BCRYPT_MAX_QUEUE more may wait; anything beyond that raises
+HashingBusy straight away (the auth routes answer 503) instead of piling up.
+
+BCRYPT_ROUNDS sets the cost of new hashes. Stored hashes with another cost
+still verify, and login_user rehashes them in the background.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from utils.metrics import BCRYPT_QUEUE_SECONDS, BCRYPT_REJECTED, BCRYPT_SECONDS, Gauge
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "32"))
+
+
+class HashingBusy(Exception):
+    """The bcrypt pool and its queue are full"""
+
+
+_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+# Runs rehash_in_background callbacks (database writes) outside the bcrypt
+# pool, so they neither hold a bcrypt slot nor count as bcrypt time
+_rehash_store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rehash-store")
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+Gauge("hush_bcrypt_in_flight", "bcrypt jobs running or queued", lambda: _in_flight)
+
+
+def _release(_future):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+def _submit(operation, func, *args):
+    """Run func(*args) on the bcrypt pool; raises HashingBusy when the queue is full"""
+    global _in_flight
+    with _in_flight_lock:
+        if _in_flight >= BCRYPT_WORKERS + BCRYPT_MAX_QUEUE:
+            BCRYPT_REJECTED.inc(operation=operation)
+            raise HashingBusy()
+        _in_flight += 1
+
+    submitted = time.perf_counter()
+
+    def job():
+        BCRYPT_QUEUE_SECONDS.observe(time.perf_counter() - submitted, operation=operation)
+        with BCRYPT_SECONDS.time(operation=operation):
+            return func(*args)
+
+    try:
+        future = _executor.submit(job)
+    except Exception:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+def hash_password(password):
+    """bcrypt hash of password at BCRYPT_ROUNDS, as a str"""
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    return _submit("hash", bcrypt.hashpw, password.encode("utf-8"), salt).result().decode("utf-8")
+
+
+def check_password(password, hashed):
+    """Whether password matches the stored bcrypt hash"""
+    return _submit("check", bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8")).result()
+
+
+def needs_rehash(hashed):
+    """Whether hashed was made with a cost other than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+def rehash_in_background(password, on_hashed):
+    """Hash password at the current cost on the pool, then call on_hashed(new_hash)
+
+    on_hashed runs on a separate thread once the hash is done. Best effort:
+    skipped when the pool is busy, and errors are only logged.
+    """
+    def store(new_hash):
+        try:
+            on_hashed(new_hash)
+        except Exception as e:
+            print(f"[WARNING password_hashing] Rehash failed: {e}")
+
+    def hashed(future):
+        if future.exception() is not None:
+            print(f"[WARNING password_hashing] Rehash failed: {future.exception()}")
+            return
+        _rehash_store_executor.submit(store, future.result().decode("utf-8"))
+
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    try:
+        future = _submit("rehash", bcrypt.hashpw, password.encode("utf-8"), salt)
+    except HashingBusy:
+        return
+    future.add_done_callback(hashed)
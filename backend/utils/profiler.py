@@ -0,0 +1,142 @@
+"""
+Opt-in request profiling.
+
+A request is profiled with cProfile when it is sampled (PROFILE_SAMPLE_RATE,
+off by default) or carries an X-Profile header matching PROFILE_TOKEN.
+Profiles are written per route to PROFILE_DIR as .prof files (open them with
+pstats or snakeviz), and PROFILE_DIR/index.html lists every route with the
+hottest functions of its latest profile.
+"""
+
+import html
+import io
+import os
+import random
+import re
+import threading
+import time
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))  # profiles kept per route
+
+_index_lock = threading.Lock()
+# One profile at a time per process: since Python 3.12 cProfile hooks
+# sys.monitoring, which a second enabled profiler refuses with ValueError
+_active_lock = threading.Lock()
+
+
+def _route_slug(method, route):
+    return re.sub(r"[^A-Za-z0-9]+", "_", f"{method}{route}").strip("_") or "root"
+
+
+def _should_profile(request):
+    if PROFILE_TOKEN and request.headers.get("X-Profile") == PROFILE_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _save_profile(profile, method, route, elapsed):
+    """Write one .prof file, drop the oldest beyond PROFILE_KEEP, rebuild the index"""
+    route_dir = os.path.join(PROFILE_DIR, _route_slug(method, route))
+    os.makedirs(route_dir, exist_ok=True)
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{threading.get_ident() % 10000}.prof"
+    profile.dump_stats(os.path.join(route_dir, filename))
+
+    files = sorted(f for f in os.listdir(route_dir) if f.endswith(".prof"))
+    for old in files[:-PROFILE_KEEP]:
+        try:
+            os.remove(os.path.join(route_dir, old))
+        except OSError:
+            pass
+
+    with _index_lock:
+        _write_index()
+
+
+def _write_index():
+    import pstats
+
+    sections = []
+    for slug in sorted(os.listdir(PROFILE_DIR)):
+        route_dir = os.path.join(PROFILE_DIR, slug)
+        if not os.path.isdir(route_dir):
+            continue
+        files = sorted(f for f in os.listdir(route_dir) if f.endswith(".prof"))
+        if not files:
+            continue
+        summary = io.StringIO()
+        try:
+            stats = pstats.Stats(os.path.join(route_dir, files[-1]), stream=summary)
+            stats.sort_stats("cumulative").print_stats(15)
+        except Exception as e:
+            summary.write(f"Could not read profile: {e}")
+        links = "".join(
+            f'<li><a href="{html.escape(slug)}/{html.escape(f)}">{html.escape(f)}</a></li>'
+            for f in reversed(files)
+        )
+        sections.append(
+            f"<h2>{html.escape(slug)} ({len(files)} profiles)</h2>"
+            f"<details><summary>Files</summary><ul>{links}</ul></details>"
+            f"<pre>{html.escape(summary.getvalue())}</pre>"
+        )
+    page = (
+        "<!doctype html><meta charset=\"utf-8\"><title>Hush-Hours profiles</title>"
+        "<h1>Request profiles</h1><p>Latest profile per route, top functions by cumulative time. "
+        "Open a .prof file with <code>python -m pstats</code> or snakeviz.</p>"
+        + "".join(sections)
+    )
+    with open(os.path.join(PROFILE_DIR, "index.html"), "w") as f:
+        f.write(page)
+
+
+def init_app(app):
+    """Profile sampled (or X-Profile) requests handled by app"""
+    from flask import g, request
+
+    if PROFILE_SAMPLE_RATE <= 0 and not PROFILE_TOKEN:
+        return
+    # Only imported when profiling is on, to keep worker start-up light
+    import cProfile
+
+    @app.before_request
+    def start_profiler():
+        if not _should_profile(request):
+            return
+        # Another request is being profiled: serve this one unprofiled
+        if not _active_lock.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Some other profiler (a debugger, coverage) holds the hook
+            print(f"[WARNING profiler] Could not start profiling: {e}")
+            _active_lock.release()
+            return
+        g.profiler = profile
+        g.profiler_started = time.perf_counter()
+
+    @app.after_request
+    def stop_profiler(response):
+        profile = g.pop("profiler", None)
+        if profile is None:
+            return response
+        profile.disable()
+        _active_lock.release()
+        elapsed = time.perf_counter() - g.pop("profiler_started")
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        # Writing and summarizing happen off the request thread
+        threading.Thread(
+            target=_save_profile, args=(profile, request.method, route, elapsed), daemon=True
+        ).start()
+        return response
+
+    @app.teardown_request
+    def drop_profiler(exc):
+        # after_request is skipped when the request raised
+        profile = g.pop("profiler", None)
+        if profile is not None:
+            profile.disable()
+            _active_lock.release()
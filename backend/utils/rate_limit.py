@@ -0,0 +1,113 @@
+"""
+Token-bucket rate limiting for the expensive auth endpoints.
+
+Each limiter allows bursts of `capacity` attempts per key and refills at
+capacity / per_seconds tokens a second. Buckets live in a BucketStore; the
+default MemoryBucketStore keeps one (tokens, updated_at, full_at) tuple per
+key and drops buckets once they have refilled, so idle keys cost nothing.
+Limits are per process: with several workers, plug in a shared store with the
+same take() method (e.g. backed by Redis) via set_store().
+
+Limits are configured as "<attempts>/<seconds>" strings.
+"""
+
+import heapq
+import math
+import os
+import threading
+import time
+
+from utils.metrics import RATE_LIMITED
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+SWEEP_INTERVAL = 60  # seconds between sweeps of refilled buckets
+
+
+class MemoryBucketStore:
+    """In-process buckets keyed by string, with eviction of refilled buckets"""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated_at, full_at)
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + SWEEP_INTERVAL
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, capacity, refill_rate, now=None):
+        """Take one token from key's bucket; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now >= self._next_sweep or len(self._buckets) >= self.max_keys:
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+                return (1 - tokens) / refill_rate
+            tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+            return 0
+
+    def _sweep(self, now):
+        # Refilled buckets behave exactly like missing ones
+        self._buckets = {k: b for k, b in self._buckets.items() if b[2] > now}
+        if len(self._buckets) >= self.max_keys:
+            # Still full (e.g. many distinct IPs): forget the buckets closest to full
+            overflow = len(self._buckets) - self.max_keys + self.max_keys // 10
+            for key in heapq.nsmallest(overflow, self._buckets, key=lambda k: self._buckets[k][2]):
+                del self._buckets[key]
+        self._next_sweep = now + SWEEP_INTERVAL
+
+
+_store = MemoryBucketStore()
+
+
+def set_store(store):
+    """Use a different (e.g. shared) bucket store for every limiter"""
+    global _store
+    _store = store
+
+
+def parse_limit(spec):
+    """'5/60' -> (5, 60.0)"""
+    attempts, seconds = spec.split("/")
+    return int(attempts), float(seconds)
+
+
+class RateLimiter:
+    """Token bucket per key: capacity attempts, refilled over per_seconds"""
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.capacity, self.per_seconds = parse_limit(spec)
+        self.refill_rate = self.capacity / self.per_seconds
+
+    def hit(self, key):
+        """Count one attempt for key; returns 0 if allowed, else Retry-After seconds"""
+        if not RATE_LIMIT_ENABLED or key is None:
+            return 0
+        wait = _store.take(f"{self.name}:{key}", self.capacity, self.refill_rate)
+        if wait:
+            RATE_LIMITED.inc(limiter=self.name)
+            return max(1, math.ceil(wait))
+        return 0
+
+
+LOGIN_PER_IP = RateLimiter("login_ip", os.getenv("RATE_LIMIT_LOGIN_IP", "20/60"))
+LOGIN_PER_USERNAME = RateLimiter("login_username", os.getenv("RATE_LIMIT_LOGIN_USERNAME", "5/60"))
+REGISTER_PER_IP = RateLimiter("register_ip", os.getenv("RATE_LIMIT_REGISTER_IP", "5/600"))
+
+
+def check(*hits):
+    """Apply (limiter, key) pairs in order; returns the first Retry-After, or 0"""
+    for limiter, key in hits:
+        wait = limiter.hit(key)
+        if wait:
+            return wait
+    return 0
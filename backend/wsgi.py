@@ -0,0 +1,10 @@
+"""
+Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+Run from backend/. Each gunicorn worker imports this module after forking, so
+each builds its own app and database pool.
+"""
+
+from app import create_app
+
+app = create_app()